@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from jose import JWTError, jwt
+
+from config import ACCESS_TOKEN_EXPIRE_MINUTES, ALGORITHM, REFRESH_TOKEN_EXPIRE_DAYS, SECRET_KEY, TOKEN_CACHE_SIZE
+
+ACCESS = "access"
+REFRESH = "refresh"
+
+
+def create_token(moderator, token_type: str) -> str:
+    now = datetime.now(timezone.utc)
+    lifetime = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES) if token_type == ACCESS else timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    claims = {
+        "sub": str(moderator.moderator_id),
+        "type": token_type,
+        "iat": now,
+        "exp": now + lifetime,
+    }
+    if token_type == ACCESS:
+        # Roles travel in the access token, so authorization needs no Moderator lookup.
+        # A refresh re-reads them, changes apply within ACCESS_TOKEN_EXPIRE_MINUTES.
+        claims.update(
+            name=moderator.moderator_name,
+            email=moderator.moderator_email,
+            is_cashier=moderator.is_cashier,
+            is_admin=moderator.is_admin,
+        )
+    return jwt.encode(claims, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def create_tokens(moderator) -> dict:
+    return {
+        "access_token": create_token(moderator, ACCESS),
+        "refresh_token": create_token(moderator, REFRESH),
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"})
+
+
+def decode_token(token: str, token_type: str) -> dict:
+    try:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise _unauthorized("Недействительный токен")
+    if claims.get("type") != token_type:
+        raise _unauthorized("Недействительный токен")
+    return claims
+
+
+class ClaimsCache:
+    """LRU of verified access tokens -> claims; expiry is still checked on every hit."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._claims = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[dict]:
+        with self._lock:
+            claims = self._claims.get(token)
+            if claims is None:
+                self.misses += 1
+                return None
+            if claims["exp"] <= time.time():
+                del self._claims[token]
+                self.misses += 1
+                return None
+            self._claims.move_to_end(token)
+            self.hits += 1
+            return claims
+
+    def put(self, token: str, claims: dict) -> None:
+        with self._lock:
+            self._claims[token] = claims
+            self._claims.move_to_end(token)
+            while len(self._claims) > self.size:
+                self._claims.popitem(last=False)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"size": len(self._claims), "max_size": self.size, "hits": self.hits, "misses": self.misses}
+
+
+claims_cache = ClaimsCache(TOKEN_CACHE_SIZE)
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+async def get_current_claims(credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)) -> dict:
+    if credentials is None:
+        raise _unauthorized("Требуется авторизация")
+    token = credentials.credentials
+    claims = claims_cache.get(token)
+    if claims is None:
+        claims = decode_token(token, ACCESS)
+        claims_cache.put(token, claims)
+    return claims
+
+
+async def get_optional_claims(credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)) -> Optional[dict]:
+    # Anonymous callers get None, a bad token is still rejected
+    if credentials is None:
+        return None
+    return await get_current_claims(credentials)
+
+
+async def require_admin(claims: dict = Depends(get_current_claims)) -> dict:
+    if not claims.get("is_admin"):
+        raise HTTPException(status_code=403, detail="Недостаточно прав")
+    return claims
+
+
+async def require_cashier(claims: dict = Depends(get_current_claims)) -> dict:
+    if not (claims.get("is_cashier") or claims.get("is_admin")):
+        raise HTTPException(status_code=403, detail="Недостаточно прав")
+    return claims
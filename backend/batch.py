@@ -0,0 +1,270 @@
+from functools import lru_cache
+from typing import Annotated, List, NamedTuple, Optional
+
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import open_rentals
+import stock
+from bulk import check_references, check_unique, coerce_value, column_values
+from counts import row_counter
+from models.models import Actor, Client, Film, Filmography, Genre, Journal, Producer, Studio
+from reference_cache import reference_cache
+from schemas import (
+    ActorCreate,
+    BatchOperation,
+    BatchOperationResult,
+    BatchResult,
+    ClientCreate,
+    FilmCreate,
+    FilmographyCreate,
+    GenreCreate,
+    JournalCreate,
+    ProducerCreate,
+    StudioCreate,
+)
+
+
+class BatchEntity(NamedTuple):
+    model: type
+    schema: type
+    # Columns that block a delete while rows still point at the entity, as in the delete_* handlers
+    dependents: tuple = ()
+    # The entity is served from the reference cache
+    cached: bool = False
+    # open_rental column to re-derive after changes
+    rentals_key: Optional[str] = None
+
+
+# Parents before children: creates run in this order, deletes in reverse
+ENTITIES = {
+    "studios": BatchEntity(Studio, StudioCreate, (Film.studio_id,), cached=True),
+    "genres": BatchEntity(Genre, GenreCreate, (Film.genre_id,), cached=True),
+    "producers": BatchEntity(Producer, ProducerCreate, (Film.producer_id,), cached=True),
+    "actors": BatchEntity(Actor, ActorCreate, (Filmography.actor_id,), cached=True),
+    "clients": BatchEntity(Client, ClientCreate, (Journal.client_id,), rentals_key="client_id"),
+    "films": BatchEntity(Film, FilmCreate, (Journal.film_id,), rentals_key="film_id"),
+    "filmographies": BatchEntity(Filmography, FilmographyCreate),
+    "journals": BatchEntity(Journal, JournalCreate, rentals_key="journal_id"),
+}
+
+PHASES = [
+    ("create", list(ENTITIES)),
+    ("update", list(ENTITIES)),
+    ("delete", list(reversed(ENTITIES))),
+]
+
+
+def _primary_key(model):
+    return model.__table__.primary_key.columns[0]
+
+
+@lru_cache(maxsize=None)
+def _field_adapter(schema, name: str) -> TypeAdapter:
+    # Validates one field with the constraints it has in the create schema
+    field = schema.model_fields[name]
+    return TypeAdapter(Annotated[field.annotation, field])
+
+
+def _validation_errors(e: ValidationError, prefix: str = "") -> List[str]:
+    return [
+        f"{'.'.join(str(part) for part in (prefix, *error['loc']) if part != '') or 'data'}: {error['msg']}"
+        for error in e.errors()
+    ]
+
+
+def _validate_changes(entity: BatchEntity, data: dict) -> tuple:
+    table = entity.model.__table__
+    values = {}
+    errors = []
+    for name, value in data.items():
+        if name not in entity.schema.model_fields:
+            errors.append(f"{name}: unknown field")
+            continue
+        try:
+            values[name] = coerce_value(table.c[name], _field_adapter(entity.schema, name).validate_python(value))
+        except ValidationError as e:
+            errors.extend(_validation_errors(e, name))
+    if not data:
+        errors.append("data: no fields to update")
+    return values, errors
+
+
+async def _missing(db: AsyncSession, entity: BatchEntity, rows: list, errors: dict) -> list:
+    pk = _primary_key(entity.model)
+    ids = {values[pk.name] for _, values in rows}
+    existing = set((await db.scalars(select(pk).where(pk.in_(ids)))).all())
+    for index, values in rows:
+        if values[pk.name] not in existing:
+            errors.setdefault(index, []).append(f"{pk.name}: {values[pk.name]} not found")
+    return [(index, values) for index, values in rows if index not in errors]
+
+
+async def _create(db: AsyncSession, entity: BatchEntity, rows: list, errors: dict) -> list:
+    table = entity.model.__table__
+    rows = await check_references(db, table, rows, errors)
+    rows = await check_unique(db, table, rows, errors)
+    if errors:
+        return []
+    pk = _primary_key(entity.model)
+    result = await db.execute(
+        insert(table).returning(pk, sort_by_parameter_order=True),
+        [values for _, values in rows],
+    )
+    return list(zip([index for index, _ in rows], result.scalars().all()))
+
+
+async def _update(db: AsyncSession, entity: BatchEntity, rows: list, errors: dict) -> list:
+    rows = await _missing(db, entity, rows, errors)
+    rows = await check_references(db, entity.model.__table__, rows, errors)
+    if errors:
+        return []
+    # ORM bulk UPDATE by primary key: one executemany per set of changed columns
+    await db.execute(update(entity.model), [values for _, values in rows])
+    pk = _primary_key(entity.model)
+    return [(index, values[pk.name]) for index, values in rows]
+
+
+async def _delete(db: AsyncSession, entity: BatchEntity, rows: list, errors: dict) -> list:
+    rows = await _missing(db, entity, rows, errors)
+    pk = _primary_key(entity.model)
+    ids = {values[pk.name] for _, values in rows}
+    # Children deleted earlier in the batch are already gone at this point
+    for column in entity.dependents:
+        referenced = set((await db.scalars(select(column).where(column.in_(ids)).distinct())).all())
+        for index, values in rows:
+            if values[pk.name] in referenced:
+                errors.setdefault(index, []).append("Невозможно удалить строку, пока есть зависимые данные в других таблицах")
+    if errors:
+        return []
+    await db.execute(delete(entity.model).where(pk.in_(ids)))
+    return [(index, values[pk.name]) for index, values in rows]
+
+
+HANDLERS = {"create": _create, "update": _update, "delete": _delete}
+
+
+def _prepare(operations: List[BatchOperation], errors: dict) -> dict:
+    groups = {}
+    for index, operation in enumerate(operations):
+        entity = ENTITIES[operation.entity]
+        pk = _primary_key(entity.model)
+        if operation.op == "create":
+            try:
+                values = column_values(entity.model.__table__, entity.schema.model_validate(operation.data).model_dump())
+            except ValidationError as e:
+                errors[index] = _validation_errors(e)
+                continue
+        elif operation.id is None:
+            errors[index] = ["id: required for update and delete"]
+            continue
+        elif operation.op == "update":
+            values, messages = _validate_changes(entity, operation.data)
+            if messages:
+                errors[index] = messages
+                continue
+            values[pk.name] = operation.id
+        else:
+            values = {pk.name: operation.id}
+        groups.setdefault((operation.op, operation.entity), []).append((index, values))
+    return groups
+
+
+async def _copies_needed(db: AsyncSession, op: str, rows: list) -> dict:
+    """film_id -> indexes of the journal creates/updates that open a rental of that film."""
+    if op == "update":
+        ids = [values["journal_id"] for _, values in rows]
+        current = {
+            row.journal_id: row
+            for row in await db.execute(
+                select(Journal.journal_id, Journal.film_id, Journal.journal_refund).where(Journal.journal_id.in_(ids))
+            )
+        }
+    needed = {}
+    for index, values in rows:
+        held = None
+        film_id, refund = values.get("film_id"), values.get("journal_refund")
+        if op == "update":
+            row = current.get(values["journal_id"])
+            if row is None:
+                continue  # reported as not found by _update
+            held = row.film_id if row.journal_refund is False else None
+            film_id = values.get("film_id", row.film_id)
+            refund = values.get("journal_refund", row.journal_refund)
+        if refund is False and film_id != held:
+            needed.setdefault(film_id, []).append(index)
+    return needed
+
+
+async def _reserve_copies(db: AsyncSession, needed: dict, errors: dict) -> None:
+    # Same rule as create_journal: no open rental without a copy on the shelf
+    for film_id, indexes in needed.items():
+        if not await stock.reserve(db, film_id, len(indexes)):
+            for index in indexes:
+                errors.setdefault(index, []).append(f"film_id: нет свободных копий фильма {film_id}")
+
+
+async def run_batch(db: AsyncSession, operations: List[BatchOperation]) -> BatchResult:
+    """Apply the operations as one set-based statement per (operation, entity) in a single
+    transaction. Any error rolls everything back; operations that did not fail are "skipped"."""
+    errors = {}
+    groups = _prepare(operations, errors)
+    ids = {}
+    touched = set()
+
+    for op, names in PHASES:
+        if errors:
+            break
+        for name in names:
+            rows = groups.get((op, name))
+            if not rows:
+                continue
+            entity = ENTITIES[name]
+            if op == "delete" and entity.rentals_key == "journal_id":
+                await open_rentals.drop_journals(db, [values["journal_id"] for _, values in rows])
+            needed = await _copies_needed(db, op, rows) if name == "journals" and op != "delete" else {}
+            try:
+                done = await HANDLERS[op](db, entity, rows, errors)
+            except IntegrityError as e:
+                # A constraint the pre-checks don't cover (e.g. a unique column changed by an update)
+                for index, _ in rows:
+                    errors.setdefault(index, []).append(str(e.orig))
+                break
+            if errors:
+                break
+            await _reserve_copies(db, needed, errors)
+            if errors:
+                break
+            ids.update(done)
+            touched.add(name)
+            if op == "create" and name == "films":
+                await stock.add_missing(db)
+            if entity.rentals_key is not None and (op != "create" or name == "journals"):
+                await open_rentals.resync(db, entity.rentals_key, [row_id for _, row_id in done])
+
+    if errors:
+        await db.rollback()
+    else:
+        await db.commit()
+        for name in touched:
+            if ENTITIES[name].cached:
+                reference_cache.invalidate(name)
+            row_counter.invalidate(ENTITIES[name].model.__tablename__)
+        if "films" in touched:
+            # Deleted films take their filmography rows along (ON DELETE CASCADE)
+            row_counter.invalidate(Filmography.__tablename__)
+
+    return BatchResult(
+        committed=not errors,
+        results=[
+            BatchOperationResult(
+                index=index,
+                status="error" if index in errors else "skipped" if errors else "ok",
+                id=ids.get(index, operation.id),
+                errors=errors.get(index, []),
+            )
+            for index, operation in enumerate(operations)
+        ],
+    )
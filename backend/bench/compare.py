@@ -0,0 +1,49 @@
+"""Compare two bench.load_test JSON results, e.g. from two commits.
+
+    python -m bench.compare before.json after.json --threshold 10
+
+Exits with 1 when a route's p95 latency got slower by more than the threshold.
+"""
+import argparse
+import json
+import sys
+
+
+def compare(base_path: str, new_path: str, threshold: float) -> int:
+    """Print the change per route; non-zero exit when a p95 got slower by more than threshold %."""
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{base['meta']['commit'][:10]} -> {new['meta']['commit'][:10]}")
+    print(f"{'route':28}{'p50 %':>9}{'p95 %':>9}{'p99 %':>9}{'rps %':>9}")
+    regressions = []
+    for route in sorted(set(base["routes"]) | set(new["routes"])):
+        if route not in base["routes"] or route not in new["routes"]:
+            print(f"{route:28}{'only in ' + ('new' if route in new['routes'] else 'base'):>36}")
+            continue
+        before, after = base["routes"][route], new["routes"][route]
+        change = {
+            key: (after[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+            for key in ("p50_ms", "p95_ms", "p99_ms", "rps")
+        }
+        print(f"{route:28}{change['p50_ms']:+9.1f}{change['p95_ms']:+9.1f}{change['p99_ms']:+9.1f}{change['rps']:+9.1f}")
+        if change["p95_ms"] > threshold:
+            regressions.append(route)
+    if regressions:
+        print(f"p95 regressed by more than {threshold}%: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10, help="allowed p95 slowdown in %%")
+    args = parser.parse_args()
+    return compare(args.base, args.new, args.threshold)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""Fail when a hot query plans a sequential scan over a large table.
+
+Run from the backend directory against a seeded database:
+
+    python -m bench.explain_check --min-rows 10000
+"""
+import argparse
+import sys
+
+from sqlalchemy import func, select, text
+
+from database import engine
+from main import journals_detailed_query, rental_debtors_query, rentals_query
+from models.models import Actor, Client, Film, Filmography, Genre, Journal, OpenRental, Producer, Studio
+from pagination import encode_cursor, paginate
+
+LARGE_TABLES = [Studio, Genre, Producer, Actor, Client, Film, Filmography, Journal, OpenRental]
+
+# Reports that return a whole table, where reading it through is the plan
+WHOLE_TABLE_READS = {
+    "rentals": {OpenRental.__tablename__},
+}
+
+
+def hot_queries(middle_journal_id: int) -> dict:
+    return {
+        "delete_studio dependency check": select(Film.film_id).where(Film.studio_id == 1).limit(1),
+        "delete_genre dependency check": select(Film.film_id).where(Film.genre_id == 1).limit(1),
+        "delete_producer dependency check": select(Film.film_id).where(Film.producer_id == 1).limit(1),
+        "delete_actor dependency check": (
+            select(Film.film_id).join(Filmography).where(Filmography.actor_id == 1).limit(1)
+        ),
+        "delete_client dependency check": select(Journal.journal_id).where(Journal.client_id == 1).limit(1),
+        "delete_film dependency check": select(Journal.journal_id).where(Journal.film_id == 1).limit(1),
+        "films by producer": (
+            select(Film.film_name, Studio.studio_name)
+            .join(Film.producer)
+            .join(Film.studio)
+            .where(Producer.producer_name == "")
+        ),
+        "journals_detailed deep page": paginate(
+            journals_detailed_query(), [Journal.journal_id], 0, 100, encode_cursor([middle_journal_id])
+        ),
+        "rentals": rentals_query(),
+        "rental_debtors": rental_debtors_query(),
+    }
+
+
+def _postgres_seq_scans(connection, sql: str) -> set:
+    plan = connection.execute(text("EXPLAIN (FORMAT JSON) " + sql)).scalar()[0]["Plan"]
+    tables = set()
+    nodes = [plan]
+    while nodes:
+        node = nodes.pop()
+        if node["Node Type"] == "Seq Scan":
+            tables.add(node["Relation Name"])
+        nodes.extend(node.get("Plans", []))
+    return tables
+
+
+def _sqlite_seq_scans(connection, sql: str) -> set:
+    tables = set()
+    for row in connection.execute(text("EXPLAIN QUERY PLAN " + sql)):
+        detail = row.detail
+        # "SCAN film USING INDEX ..." walks an index, a bare "SCAN film" reads the table
+        if detail.startswith("SCAN ") and " USING " not in detail:
+            tables.add(detail.split()[1])
+    return tables
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--min-rows", type=int, default=10000,
+                        help="tables with fewer rows may be scanned sequentially")
+    parser.add_argument("--no-analyze", action="store_true", help="skip refreshing planner statistics")
+    args = parser.parse_args()
+
+    with engine.connect() as connection:
+        dialect = connection.dialect.name
+        if dialect not in ("postgresql", "sqlite"):
+            parser.error(f"unsupported database: {dialect}")
+        if not args.no_analyze:
+            connection.execute(text("ANALYZE"))
+
+        sizes = {
+            model.__tablename__: connection.scalar(select(func.count()).select_from(model))
+            for model in LARGE_TABLES
+        }
+        large = {name for name, rows in sizes.items() if rows >= args.min_rows}
+        if not large:
+            print(f"No table has {args.min_rows} rows, seed the database first", file=sys.stderr)
+            return 2
+
+        middle = connection.scalar(select(func.max(Journal.journal_id))) or 0
+        seq_scans = _postgres_seq_scans if dialect == "postgresql" else _sqlite_seq_scans
+        failed = False
+        for name, query in hot_queries(middle // 2).items():
+            sql = str(query.compile(connection, compile_kwargs={"literal_binds": True}))
+            scanned = (seq_scans(connection, sql) & large) - WHOLE_TABLE_READS.get(name, set())
+            if scanned:
+                failed = True
+                tables = ", ".join(f"{table} ({sizes[table]} rows)" for table in sorted(scanned))
+                print(f"FAIL  {name}: seq scan on {tables}")
+            else:
+                print(f"ok    {name}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
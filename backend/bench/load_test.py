@@ -0,0 +1,270 @@
+"""Drive realistic request mixes against the API and report latency per route.
+
+Run from the backend directory. By default the app from main.py is served
+in-process over ASGI; --base-url targets a running server instead:
+
+    python -m bench.seed --scale 1                      # replaces the data!
+    python -m bench.load_test --mix mixed --duration 30 --output before.json
+    python -m bench.compare before.json after.json --threshold 10
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import httpx
+from sqlalchemy import delete, exists, func, select
+
+import stock
+from database import AsyncSessionLocal, SQLALCHEMY_DATABASE_URL, async_engine
+from models.models import Client, Film, Journal, OpenRental
+
+# Scenario weights per mix
+MIXES = {
+    "cashier": {"cashier": 1},
+    "browse": {"browse": 1},
+    "reports": {"reports": 1},
+    "mixed": {"cashier": 3, "browse": 5, "reports": 2},
+}
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    def add(self, route: str, seconds: float, ok: bool) -> None:
+        self.latencies.setdefault(route, []).append(seconds)
+        if not ok:
+            self.errors[route] = self.errors.get(route, 0) + 1
+
+
+class Workload:
+    """What the scenarios need to know about the seeded data."""
+
+    def __init__(self, film_ids: list, walk_in_ids: list, journals: int):
+        self.film_ids = film_ids
+        self.walk_in_ids = walk_in_ids
+        self.journals = journals
+        # Each rental gets a (film, walk-in client) pair of its own, so uq_journal_film_client holds.
+        # Consecutive rentals take different films, concurrent cashiers don't compete for one copy.
+        self.pairs = itertools.count()
+        self.journal_ids = []
+
+    def next_pair(self) -> tuple:
+        number = next(self.pairs)
+        films = len(self.film_ids)
+        return self.film_ids[number % films], self.walk_in_ids[(number // films) % len(self.walk_in_ids)]
+
+
+async def load_workload() -> Workload:
+    async with AsyncSessionLocal() as db:
+        film_ids = (await db.scalars(select(Film.film_id).order_by(Film.film_id))).all()
+        walk_in_ids = (await db.scalars(
+            select(Client.client_id)
+            .where(~exists().where(Journal.client_id == Client.client_id))
+            .order_by(Client.client_id)
+        )).all()
+        journals = await db.scalar(select(func.count()).select_from(Journal))
+    return Workload(list(film_ids), list(walk_in_ids), journals)
+
+
+async def _request(client: httpx.AsyncClient, recorder: Recorder, route: str, method: str, url: str, **kwargs):
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+    except httpx.HTTPError:
+        recorder.add(route, time.perf_counter() - start, False)
+        return None
+    recorder.add(route, time.perf_counter() - start, response.status_code < 400)
+    return response
+
+
+async def cashier(client, recorder: Recorder, workload: Workload, rng: random.Random) -> None:
+    # Issue a film to a client, then take it back
+    film_id, client_id = workload.next_pair()
+    issue = date.today() - timedelta(days=rng.randint(0, 20))
+    journal = {
+        "film_id": film_id,
+        "client_id": client_id,
+        "journal_date_issue": f"{issue}T00:00:00",
+        "journal_date_return": f"{issue + timedelta(days=rng.randint(1, 14))}T00:00:00",
+        "journal_refund": False,
+    }
+    response = await _request(client, recorder, "POST /journals/", "POST", "/journals/", json=journal)
+    if response is None or response.status_code >= 400:
+        return
+    journal_id = response.json()["journal_id"]
+    workload.journal_ids.append(journal_id)
+    await _request(client, recorder, "PUT /journals/{id}", "PUT", f"/journals/{journal_id}", json={**journal, "journal_refund": True})
+
+
+async def browse(client, recorder: Recorder, workload: Workload, rng: random.Random) -> None:
+    # Open the catalogue and page through it by cursor
+    url = "/films_detailed/?limit=50"
+    for _ in range(rng.randint(1, 3)):
+        response = await _request(client, recorder, "GET /films_detailed/", "GET", url)
+        cursor = response.headers.get("X-Next-Cursor") if response is not None else None
+        if not cursor:
+            return
+        url = f"/films_detailed/?limit=50&after={cursor}"
+
+
+async def reports(client, recorder: Recorder, workload: Workload, rng: random.Random) -> None:
+    route = rng.choice(["/rentals", "/rental_debtors", "/films/grouped_by_genre"])
+    await _request(client, recorder, f"GET {route}", "GET", route)
+
+
+SCENARIOS = {"cashier": cashier, "browse": browse, "reports": reports}
+
+
+async def _worker(client, recorder, workload, mix: dict, rng: random.Random, deadline: float, budget: itertools.count, requests: int):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    while time.perf_counter() < deadline and (requests is None or next(budget) < requests):
+        scenario = rng.choices(names, weights)[0]
+        await SCENARIOS[scenario](client, recorder, workload, rng)
+
+
+def _percentile(ordered: list, share: float) -> float:
+    # Nearest rank
+    return ordered[min(len(ordered) - 1, max(0, int(round(share * len(ordered))) - 1))]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    routes = {}
+    everything = []
+    for route, latencies in sorted(recorder.latencies.items()):
+        ordered = sorted(latencies)
+        everything.extend(ordered)
+        routes[route] = {
+            "requests": len(ordered),
+            "errors": recorder.errors.get(route, 0),
+            "rps": round(len(ordered) / elapsed, 2),
+            "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+            "p50_ms": round(_percentile(ordered, 0.50) * 1000, 3),
+            "p95_ms": round(_percentile(ordered, 0.95) * 1000, 3),
+            "p99_ms": round(_percentile(ordered, 0.99) * 1000, 3),
+            "max_ms": round(ordered[-1] * 1000, 3),
+        }
+    everything.sort()
+    total = {
+        "requests": len(everything),
+        "errors": sum(recorder.errors.values()),
+        "rps": round(len(everything) / elapsed, 2),
+    }
+    if everything:
+        total.update(
+            p50_ms=round(_percentile(everything, 0.50) * 1000, 3),
+            p95_ms=round(_percentile(everything, 0.95) * 1000, 3),
+            p99_ms=round(_percentile(everything, 0.99) * 1000, 3),
+        )
+    return {"routes": routes, "total": total}
+
+
+def _git(*args) -> str:
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+async def _cleanup(workload: Workload) -> None:
+    # Drop the rentals this run created, so runs on the same data stay comparable
+    async with AsyncSessionLocal() as db:
+        for start in range(0, len(workload.journal_ids), 1000):
+            chunk = workload.journal_ids[start:start + 1000]
+            await db.execute(delete(OpenRental).where(OpenRental.journal_id.in_(chunk)))
+            await db.execute(delete(Journal).where(Journal.journal_id.in_(chunk)))
+        await stock.recount(db)
+        await db.commit()
+
+
+async def run(args) -> dict:
+    workload = await load_workload()
+    if not workload.film_ids:
+        raise SystemExit("The database has no films, seed it first: python -m bench.seed")
+    if not workload.walk_in_ids and args.mix in ("cashier", "mixed"):
+        raise SystemExit("No client without rentals is left for the cashier scenario, re-seed the database")
+
+    if args.base_url:
+        transport = None
+        base_url = args.base_url
+    else:
+        from main import app
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://load-test"
+
+    recorder = Recorder()
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=60) as client:
+        if args.warmup:
+            await asyncio.gather(*(
+                _worker(client, Recorder(), workload, MIXES[args.mix], random.Random(args.seed - worker - 1),
+                        time.perf_counter() + args.warmup, itertools.count(), None)
+                for worker in range(args.concurrency)
+            ))
+        start = time.perf_counter()
+        budget = itertools.count()
+        await asyncio.gather(*(
+            _worker(client, recorder, workload, MIXES[args.mix], random.Random(args.seed + worker),
+                    start + args.duration, budget, args.requests)
+            for worker in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - start
+
+    await _cleanup(workload)
+    await async_engine.dispose()
+
+    result = summarize(recorder, elapsed)
+    result["meta"] = {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "database": args.base_url or SQLALCHEMY_DATABASE_URL.get_backend_name(),
+        "journals": workload.journals,
+        "mix": args.mix,
+        "concurrency": args.concurrency,
+        "duration": round(elapsed, 3),
+        "seed": args.seed,
+    }
+    return result
+
+
+def print_result(result: dict) -> None:
+    print(f"{'route':28}{'req':>8}{'err':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for route, stats in list(result["routes"].items()) + [("total", result["total"])]:
+        print(
+            f"{route:28}{stats['requests']:8}{stats['errors']:6}{stats['rps']:9.1f}"
+            f"{stats.get('p50_ms', 0):10.2f}{stats.get('p95_ms', 0):10.2f}{stats.get('p99_ms', 0):10.2f}"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mix", choices=sorted(MIXES), default="mixed")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to measure")
+    parser.add_argument("--requests", type=int, help="stop after this many scenarios instead")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds to run before measuring")
+    parser.add_argument("--concurrency", type=int, default=8, help="simulated clients")
+    parser.add_argument("--seed", type=int, default=1, help="random seed of the simulated clients")
+    parser.add_argument("--base-url", help="drive a running server instead of the in-process app")
+    parser.add_argument("--output", help="write the results as JSON, see bench.compare")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print_result(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
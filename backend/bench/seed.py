@@ -0,0 +1,266 @@
+"""Generate a referentially valid data set of any size from the models.
+
+    python -m bench.seed --scale 1       # ~30k journals
+    python -m bench.seed --scale 34      # ~1M journals
+
+Replaces all catalogue, client and journal rows of the configured database;
+without DATABASE_URL (the .env database) it asks for --yes.
+Rows are produced lazily and written in batches (COPY on Postgres), so memory
+use does not grow with the scale.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from sqlalchemy import Boolean, Date, Integer, Numeric, String, Text, delete, text
+
+import open_rentals
+import stock
+import search  # registers the full text search DDL with create_all
+from bulk import column_values, insert_rows
+from config import DATABASE_URL
+from database import AsyncSessionLocal, SQLALCHEMY_DATABASE_URL, async_engine
+from models.models import Actor, Base, Client, Film, FilmStock, Filmography, Genre, Journal, OpenRental, Producer, Studio
+
+BATCH_SIZE = 5000
+
+# Rows per unit of scale
+SIZES = {
+    "studio": 20,
+    "genre": 15,
+    "producer": 200,
+    "actor": 1000,
+    "film": 5000,
+    "client": 3000,
+    "journal": 30000,
+}
+
+# Foreign keys drawn with a power law: a higher value concentrates rows on fewer parents
+SKEW = {
+    ("film", "studio_id"): 2.0,
+    ("film", "genre_id"): 1.5,
+    ("film", "producer_id"): 1.5,
+    ("filmography", "actor_id"): 2.0,
+    ("journal", "film_id"): 3.0,  # hot films
+}
+CLIENT_ACTIVITY = 0.6  # repeat clients: the n-th client rents ~ n ** -CLIENT_ACTIVITY films
+ACTORS_PER_FILM = (1, 6)
+
+# Share of clients created without rentals, the load test issues rentals to them
+WALK_IN_SHARE = 0.2
+# Copies of each film on the shelf, besides the ones out on open rentals
+SPARE_COPIES = 3
+
+FIRST_NAMES = ["Иван", "Анна", "Пётр", "Мария", "Алексей", "Ольга", "Дмитрий", "Елена", "Сергей", "Наталья"]
+LAST_NAMES = ["Иванов", "Смирнов", "Кузнецов", "Попов", "Васильев", "Петров", "Соколов", "Михайлов", "Новиков", "Фёдоров"]
+COUNTRIES = ["Россия", "США", "Франция", "Германия", "Италия", "Япония", "Великобритания"]
+WORDS = [
+    "ночь", "город", "море", "любовь", "война", "тайна", "дорога", "время", "огонь", "зима",
+    "дом", "небо", "брат", "звезда", "путь", "сердце", "тень", "мир", "остров", "свет",
+]
+
+# Columns that read better than the generic value for their type
+OVERRIDES = {
+    ("studio", "studio_name"): lambda rng, n: f"{rng.choice(WORDS).capitalize()} Пикчерз {n}",
+    ("studio", "studio_country"): lambda rng, n: rng.choice(COUNTRIES),
+    ("genre", "genre_name"): lambda rng, n: f"{rng.choice(WORDS).capitalize()} {n}",
+    ("producer", "producer_name"): lambda rng, n: f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+    ("actor", "actor_name"): lambda rng, n: f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+    ("client", "client_first_name"): lambda rng, n: rng.choice(FIRST_NAMES),
+    ("client", "client_last_name"): lambda rng, n: rng.choice(LAST_NAMES),
+    ("client", "client_address"): lambda rng, n: f"ул. {rng.choice(LAST_NAMES)}а, д. {rng.randint(1, 200)}, кв. {rng.randint(1, 300)}",
+    ("client", "client_passport"): lambda rng, n: f"{4000 + n // 1000000:04d} {n % 1000000:06d}",
+    ("client", "client_phone_number"): lambda rng, n: f"+79{rng.randint(0, 999999999):09d}",
+    ("film", "film_name"): lambda rng, n: " ".join(rng.choices(WORDS, k=rng.randint(1, 3))).capitalize(),
+    ("film", "film_rental"): lambda rng, n: Decimal(rng.randint(99, 999)) / 100,
+}
+
+
+def skewed(rng: random.Random, size: int, skew: float) -> int:
+    """An id in 1..size; skew 1 is uniform, larger values favour the low ids."""
+    return min(size, int(size * rng.random() ** skew) + 1)
+
+
+def value_for(rng: random.Random, table, column, number: int, sizes: dict):
+    """A value for one column, derived from its type, foreign key and unique flag."""
+    override = OVERRIDES.get((table.name, column.name))
+    if override is not None:
+        return override(rng, number)
+    if column.primary_key:
+        return number
+    for foreign_key in column.foreign_keys:
+        parent = foreign_key.column.table.name
+        return skewed(rng, sizes[parent], SKEW.get((table.name, column.name), 1.0))
+    kind = column.type
+    if isinstance(kind, Text):
+        return " ".join(rng.choices(WORDS, k=rng.randint(10, 60)))
+    if isinstance(kind, String):
+        value = f"{column.name} {number}" if column.unique else " ".join(rng.choices(WORDS, k=3))
+        return value[:kind.length] if kind.length else value
+    if isinstance(kind, Numeric):
+        return Decimal(rng.randint(100, 10000)) / 100
+    if isinstance(kind, Date):
+        return date(1970, 1, 1) + timedelta(days=rng.randint(0, 20000))
+    if isinstance(kind, Boolean):
+        return rng.random() < 0.5
+    if isinstance(kind, Integer):
+        return rng.randint(0, 1000)
+    return None
+
+
+def generic_rows(rng: random.Random, model, sizes: dict):
+    table = model.__table__
+    for number in range(1, sizes[table.name] + 1):
+        values = {column.name: value_for(rng, table, column, number, sizes) for column in table.columns}
+        # Python side defaults (created_at) are not applied by COPY
+        yield column_values(table, {name: value for name, value in values.items() if value is not None})
+
+
+def filmography_rows(rng: random.Random, sizes: dict):
+    # Every film gets a cast of distinct actors
+    table = Filmography.__table__
+    number = 0
+    for film_id in range(1, sizes["film"] + 1):
+        cast = {value_for(rng, table, table.c.actor_id, 0, sizes) for _ in range(rng.randint(*ACTORS_PER_FILM))}
+        for actor_id in sorted(cast):
+            number += 1
+            yield {"filmography_id": number, "film_id": film_id, "actor_id": actor_id}
+
+
+def journal_rows(rng: random.Random, sizes: dict):
+    # Clients rent in a long tail with the regulars first; a client takes a film
+    # at most once (uq_journal_film_client), so only one client's films are held
+    table = Journal.__table__
+    regulars = max(1, int(sizes["client"] * (1 - WALK_IN_SHARE)))
+    total_weight = sum(client_id ** -CLIENT_ACTIVITY for client_id in range(1, regulars + 1))
+    limit = max(1, sizes["film"] // 2)
+    today = date.today()
+    number = 0
+    carry = 0.0
+    for client_id in range(1, regulars + 1):
+        wanted = client_id ** -CLIENT_ACTIVITY / total_weight * sizes["journal"] + carry
+        rentals = min(int(wanted), limit)
+        carry = wanted - rentals
+        films = set()
+        while len(films) < rentals:
+            films.add(value_for(rng, table, table.c.film_id, 0, sizes))
+        for film_id in sorted(films):
+            number += 1
+            issue = today - timedelta(days=int(730 * rng.random() ** 2))
+            yield {
+                "journal_id": number,
+                "film_id": film_id,
+                "client_id": client_id,
+                "journal_date_issue": issue,
+                "journal_date_return": issue + timedelta(days=rng.randint(1, 30)),
+                # Old rentals are almost all closed, recent ones mostly open
+                "journal_refund": rng.random() < (0.97 if (today - issue).days > 30 else 0.3),
+            }
+
+
+async def _write(db, model, rows, batch_size: int) -> int:
+    table = model.__table__
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            await insert_rows(db, table, batch)
+            count += len(batch)
+            batch = []
+    await insert_rows(db, table, batch)
+    await db.commit()
+    return count + len(batch)
+
+
+async def _clear(db) -> None:
+    connection = await db.connection()
+    models = (OpenRental, Journal, Filmography, FilmStock, Film, Client, Actor, Producer, Genre, Studio)
+    if connection.dialect.name == "postgresql":
+        tables = ", ".join(model.__tablename__ for model in models)
+        await db.execute(text(f"TRUNCATE {tables} RESTART IDENTITY"))
+    else:
+        for model in models:
+            await db.execute(delete(model))
+    await db.commit()
+
+
+async def _reset_sequences(db) -> None:
+    # Ids are written explicitly, move the Postgres sequences past them
+    connection = await db.connection()
+    if connection.dialect.name != "postgresql":
+        return
+    for model in (Studio, Genre, Producer, Actor, Film, Filmography, Client, Journal):
+        table = model.__tablename__
+        pk = model.__table__.primary_key.columns[0].name
+        await db.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', '{pk}'), coalesce(max({pk}), 0) + 1, false) FROM {table}"
+        ))
+
+
+async def seed(scale: float = 1.0, seed: int = 42, batch_size: int = BATCH_SIZE, report=None) -> dict:
+    """Replace the data with a generated set; returns rows written per table."""
+    rng = random.Random(seed)
+    sizes = {name: max(1, int(size * scale)) for name, size in SIZES.items()}
+    async with async_engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+    counts = {}
+    async with AsyncSessionLocal() as db:
+        await _clear(db)
+        # Parents before children, as the foreign keys require
+        for model, rows in (
+            (Studio, generic_rows(rng, Studio, sizes)),
+            (Genre, generic_rows(rng, Genre, sizes)),
+            (Producer, generic_rows(rng, Producer, sizes)),
+            (Actor, generic_rows(rng, Actor, sizes)),
+            (Client, generic_rows(rng, Client, sizes)),
+            (Film, generic_rows(rng, Film, sizes)),
+            (Filmography, filmography_rows(rng, sizes)),
+            (Journal, journal_rows(rng, sizes)),
+        ):
+            start = time.perf_counter()
+            counts[model.__tablename__] = await _write(db, model, rows, batch_size)
+            if report is not None:
+                report(model.__tablename__, counts[model.__tablename__], time.perf_counter() - start)
+        await _reset_sequences(db)
+        counts["open_rental"] = await open_rentals.rebuild(db)
+        # Stocked again now that the open rentals are known: each holds a copy
+        await db.execute(delete(FilmStock))
+        await stock.add_missing(db, SPARE_COPIES)
+        await db.commit()
+    return counts
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1.0, help="1 = about 30k journals")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--yes", action="store_true", help="replace the data of the .env database (DB_HOST/DB_NAME)")
+    args = parser.parse_args()
+    if not DATABASE_URL and not args.yes:
+        # Without DATABASE_URL the target is the real database from .env
+        target = SQLALCHEMY_DATABASE_URL.render_as_string(hide_password=True)
+        raise SystemExit(f"This deletes every row of {target}. Set DATABASE_URL to a scratch database or pass --yes.")
+
+    def report(table: str, rows: int, seconds: float) -> None:
+        print(f"{table:15}{rows:>10} rows {seconds:8.2f}s {rows / seconds if seconds else 0:>10.0f} rows/s", flush=True)
+
+    async def run():
+        try:
+            return await seed(args.scale, args.seed, args.batch_size, report)
+        finally:
+            await async_engine.dispose()
+
+    counts = asyncio.run(run())
+    print(f"{'open_rental':15}{counts['open_rental']:>10} rows")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""Compare the Pydantic and the orjson serialization of a large report, without a database.
+
+Run from the backend directory:
+
+    python -m bench.serialization --rows 100000
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import List
+
+import httpx
+from fastapi import FastAPI, Response
+
+from export import encode_rows
+from schemas import FilmGenreResponse
+
+COLUMNS = ("genre_name", "film_name", "producer_name", "studio_name", "film_date_release", "film_rental")
+
+
+def make_rows(count: int) -> list:
+    # Shaped like the rows of /films/grouped_by_genre
+    return [
+        (
+            f"Жанр {number % 15}",
+            f"Фильм номер {number}",
+            f"Режиссёр {number % 200}",
+            f"Студия {number % 20}",
+            date(1970, 1, 1) + timedelta(days=number % 20000),
+            Decimal(99 + number % 900) / 100,
+        )
+        for number in range(count)
+    ]
+
+
+def build_app(rows: list) -> FastAPI:
+    app = FastAPI()
+
+    # What the report endpoints did: a model per row, validated again against response_model
+    @app.get("/pydantic", response_model=List[FilmGenreResponse])
+    async def pydantic_path():
+        return [FilmGenreResponse(**dict(zip(COLUMNS, row))) for row in rows]
+
+    @app.get("/orjson", response_model=List[FilmGenreResponse])
+    async def orjson_path():
+        return Response(encode_rows(COLUMNS, rows), media_type="application/json")
+
+    return app
+
+
+async def measure(app: FastAPI, path: str, repeat: int) -> dict:
+    timings = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = await client.get(path)
+            timings.append(time.perf_counter() - start)
+            response.raise_for_status()
+    return {"median_ms": statistics.median(timings) * 1000, "best_ms": min(timings) * 1000, "body": response.content}
+
+
+async def run(count: int, repeat: int) -> None:
+    app = build_app(make_rows(count))
+    results = {path: await measure(app, f"/{path}", repeat) for path in ("pydantic", "orjson")}
+    if json.loads(results["pydantic"]["body"]) != json.loads(results["orjson"]["body"]):
+        raise SystemExit("The two paths produced different JSON")
+
+    print(f"{count} rows, {repeat} requests each")
+    print(f"{'':10}{'median ms':>12}{'best ms':>12}{'bytes':>12}")
+    for path, result in results.items():
+        print(f"{path:10}{result['median_ms']:12.1f}{result['best_ms']:12.1f}{len(result['body']):12}")
+    print(f"speed-up  {results['pydantic']['median_ms'] / results['orjson']['median_ms']:11.1f}x")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.repeat))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
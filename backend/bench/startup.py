@@ -0,0 +1,70 @@
+"""Measure how long a fresh worker takes from process start to its first response.
+
+Run from the backend directory; every round starts a new interpreter, imports
+main, runs the lifespan startup and serves one request over ASGI:
+
+    python -m bench.startup --repeat 5
+    STARTUP_WARMUP=false python -m bench.startup     # without the warm-up
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+# Runs in the child process; prints its timings as one JSON line
+CHILD = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+import httpx
+import main
+imported = time.perf_counter()
+
+async def run():
+    async with main.app.router.lifespan_context(main.app):
+        started = time.perf_counter()
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://startup") as client:
+            response = await client.get(sys.argv[1])
+        served = time.perf_counter()
+    return started, served, response.status_code
+
+started, served, status = asyncio.run(run())
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "lifespan_ms": (started - imported) * 1000,
+    "first_request_ms": (served - started) * 1000,
+    "status": status,
+}))
+"""
+
+
+def measure(path: str) -> dict:
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-c", CHILD, path], capture_output=True, text=True)
+    wall = (time.perf_counter() - start) * 1000
+    if completed.returncode != 0:
+        raise SystemExit(completed.stderr)
+    timings = json.loads(completed.stdout.strip().splitlines()[-1])
+    timings["process_ms"] = wall
+    return timings
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="fresh processes to start")
+    parser.add_argument("--path", default="/films_detailed/?limit=50", help="the first request")
+    args = parser.parse_args()
+
+    rounds = [measure(args.path) for _ in range(args.repeat)]
+    statuses = {result["status"] for result in rounds}
+    print(f"{'median of ' + str(args.repeat):22}{'ms':>10}")
+    for name in ("import_ms", "lifespan_ms", "first_request_ms", "process_ms"):
+        print(f"{name:22}{statistics.median(result[name] for result in rounds):10.1f}")
+    print(f"{'first response status':22}{', '.join(map(str, sorted(statuses))):>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
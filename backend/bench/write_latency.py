@@ -0,0 +1,143 @@
+"""Compare per-request latency of the RETURNING write paths with the old add/commit/refresh ones.
+
+Run from the backend directory; writes go to the configured database (DATABASE_URL
+may point at a scratch SQLite file) and the rows it creates are deleted at the end:
+
+    python -m bench.write_latency --requests 500
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import open_rentals
+from database import AsyncSessionLocal, async_engine
+from main import app, get_db
+from models.models import Film, FilmStock, Genre, Producer, Studio
+from query_counter import count_statements
+from schemas import FilmBasicRead, FilmCreate
+
+# The handlers as they were before the RETURNING rework, kept here as the baseline
+legacy = FastAPI()
+
+
+@legacy.post("/films/", response_model=FilmBasicRead)
+async def legacy_create_film(film: FilmCreate, db: AsyncSession = Depends(get_db)):
+    db_film = Film(**film.model_dump())
+    db.add(db_film)
+    await db.commit()
+    await db.refresh(db_film)
+    return db_film
+
+
+@legacy.put("/films/{film_id}", response_model=FilmBasicRead)
+async def legacy_update_film(film_id: int, film: FilmCreate, db: AsyncSession = Depends(get_db)):
+    db_film = await db.get(Film, film_id)
+    if db_film is None:
+        raise HTTPException(status_code=404, detail="Film not found")
+    for key, value in film.model_dump().items():
+        setattr(db_film, key, value)
+    await open_rentals.sync_film(db, db_film)
+    await db.commit()
+    await db.refresh(db_film)
+    return db_film
+
+
+async def _reference_ids(created: list) -> dict:
+    async with AsyncSessionLocal() as db:
+        ids = {}
+        for model, column, values in (
+            (Studio, "studio_id", {"studio_name": "bench", "studio_country": "bench"}),
+            (Genre, "genre_id", {"genre_name": "bench"}),
+            (Producer, "producer_id", {"producer_name": "bench"}),
+        ):
+            ids[column] = await db.scalar(select(getattr(model, column)).limit(1))
+            if ids[column] is None:
+                ids[column] = await db.scalar(insert(model).values(**values).returning(getattr(model, column)))
+                created.append((model, ids[column]))
+        await db.commit()
+        return ids
+
+
+def _film(ids: dict, number: int) -> dict:
+    return {
+        **ids,
+        "film_name": f"bench film {number}",
+        "film_date_release": "2000-01-01",
+        "film_rental": 1.5 + number % 10,
+        "film_annotation": "bench",
+    }
+
+
+async def _measure(client: httpx.AsyncClient, requests: list, film_ids: list) -> dict:
+    latencies = []
+    with count_statements() as counter:
+        for method, url, body in requests:
+            start = time.perf_counter()
+            response = await client.request(method, url, json=body)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+            if method == "POST":
+                film_ids.append(response.json()["film_id"])
+    latencies.sort()
+    return {
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000,
+        "statements": counter.count / len(requests),
+    }
+
+
+async def _cleanup(film_ids: list, created: list) -> None:
+    async with AsyncSessionLocal() as db:
+        for start in range(0, len(film_ids), 1000):
+            chunk = film_ids[start:start + 1000]
+            # The legacy creates have no stock row, the others do
+            await db.execute(delete(FilmStock).where(FilmStock.film_id.in_(chunk)))
+            await db.execute(delete(Film).where(Film.film_id.in_(chunk)))
+        for model, row_id in created:
+            await db.execute(delete(model).where(model.__mapper__.primary_key[0] == row_id))
+        await db.commit()
+
+
+async def run(requests: int) -> None:
+    film_ids = []
+    created = []
+    results = {}
+    try:
+        ids = await _reference_ids(created)
+        for name, target in (("legacy", legacy), ("returning", app)):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=target), base_url="http://bench") as client:
+                warm = []
+                for number in range(3):  # warm up the pool and the statement caches
+                    warm.append((await client.post("/films/", json=_film(ids, number))).json()["film_id"])
+                film_ids.extend(warm)
+                creates = [("POST", "/films/", _film(ids, number)) for number in range(requests)]
+                results[f"{name} create"] = await _measure(client, creates, film_ids)
+                updates = [("PUT", f"/films/{warm[number % 3]}", _film(ids, number)) for number in range(requests)]
+                results[f"{name} update"] = await _measure(client, updates, film_ids)
+    finally:
+        await _cleanup(film_ids, created)
+        await async_engine.dispose()
+
+    print(f"{'':18}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'SQL/req':>10}")
+    for name, result in results.items():
+        print(f"{name:18}{result['mean_ms']:10.3f}{result['p50_ms']:10.3f}{result['p95_ms']:10.3f}{result['statements']:10.1f}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500, help="requests per write path")
+    args = parser.parse_args()
+    asyncio.run(run(args.requests))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+import csv
+import io
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+from sqlalchemy import Date, Numeric, UniqueConstraint, insert, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from schemas import BulkImportResult, BulkRowError
+
+BATCH_SIZE = 1000
+
+JSON_TYPES = ("application/json",)
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+CSV_TYPES = ("text/csv", "application/csv")
+
+
+class RowParseError(ValueError):
+    pass
+
+
+def _guess_format(filename: str, content_type: str) -> str:
+    extension = (filename or "").rsplit(".", 1)[-1].lower()
+    if extension == "csv":
+        return CSV_TYPES[0]
+    if extension in ("ndjson", "jsonl"):
+        return NDJSON_TYPES[0]
+    if extension == "json":
+        return JSON_TYPES[0]
+    return content_type
+
+
+def parse_rows(text: str, content_type: str) -> list:
+    if content_type in JSON_TYPES:
+        try:
+            rows = json.loads(text)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of objects")
+        return rows
+    if content_type in NDJSON_TYPES:
+        rows = []
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError as e:
+                rows.append(RowParseError(f"Invalid JSON: {e}"))
+        return rows
+    if content_type in CSV_TYPES:
+        # Empty cells become NULL so optional columns can be left blank
+        return [
+            {key: value if value != "" else None for key, value in row.items()}
+            for row in csv.DictReader(io.StringIO(text))
+        ]
+    raise HTTPException(status_code=415, detail="Expected JSON, NDJSON or CSV")
+
+
+async def read_rows(request: Request) -> list:
+    """Rows from a JSON array, NDJSON or CSV body, or the same as a multipart 'file' upload."""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type == "multipart/form-data":
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Expected a 'file' upload")
+        body = await upload.read()
+        content_type = _guess_format(upload.filename, upload.content_type)
+    else:
+        body = await request.body()
+    try:
+        text = body.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Upload must be UTF-8 encoded")
+    return parse_rows(text, content_type)
+
+
+def coerce_value(column, value):
+    if isinstance(column.type, Date) and isinstance(value, datetime):
+        return value.date()
+    if isinstance(column.type, Numeric) and isinstance(value, float):
+        return Decimal(str(value))
+    return value
+
+
+def column_values(table, values: dict) -> dict:
+    for column in table.columns:
+        if column.name not in values:
+            # COPY bypasses Core, so Python side defaults are applied here
+            if column.default is not None and not column.primary_key:
+                default = column.default
+                values[column.name] = default.arg(None) if default.is_callable else default.arg
+            continue
+        values[column.name] = coerce_value(column, values[column.name])
+    return values
+
+
+def _chunks(items: list, size: int = BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+async def check_references(db: AsyncSession, table, valid: list, errors: dict) -> list:
+    # Rows may leave a foreign key out (partial updates), those are not checked
+    for foreign_key in table.foreign_keys:
+        name = foreign_key.parent.name
+        target = foreign_key.column
+        wanted = list({values[name] for _, values in valid if name in values})
+        existing = set()
+        for chunk in _chunks(wanted):
+            existing.update((await db.scalars(select(target).where(target.in_(chunk)))).all())
+        for number, values in valid:
+            if name in values and values[name] not in existing:
+                errors.setdefault(number, []).append(f"{name}: {values[name]} does not exist")
+    return [(number, values) for number, values in valid if number not in errors]
+
+
+def _unique_keys(table) -> list:
+    # unique=True columns also show up as single column UniqueConstraints
+    keys = {(column.name,) for column in table.columns if column.unique}
+    for constraint in table.constraints:
+        if isinstance(constraint, UniqueConstraint):
+            keys.add(tuple(column.name for column in constraint.columns))
+    return sorted(keys)
+
+
+async def check_unique(db: AsyncSession, table, valid: list, errors: dict) -> list:
+    for names in _unique_keys(table):
+        columns = [table.c[name] for name in names]
+        label = ", ".join(names)
+        seen = {}
+        for number, values in valid:
+            key = tuple(values[name] for name in names)
+            if key in seen:
+                errors.setdefault(number, []).append(f"{label}: duplicates row {seen[key]}")
+            else:
+                seen[key] = number
+        existing = set()
+        for chunk in _chunks(list(seen)):
+            if len(columns) == 1:
+                query = select(columns[0]).where(columns[0].in_([key[0] for key in chunk]))
+            else:
+                query = select(*columns).where(tuple_(*columns).in_(chunk))
+            existing.update(tuple(row) for row in (await db.execute(query)).all())
+        for number, values in valid:
+            if tuple(values[name] for name in names) in existing:
+                errors.setdefault(number, []).append(f"{label}: already exists")
+    return [(number, values) for number, values in valid if number not in errors]
+
+
+async def insert_rows(db: AsyncSession, table, rows: list) -> None:
+    """COPY on Postgres, batched multi-row INSERTs elsewhere; rows must share their keys."""
+    if not rows:
+        return
+    connection = await db.connection()
+    if connection.dialect.name == "postgresql":
+        columns = list(rows[0])
+        raw = await connection.get_raw_connection()
+        if not raw.driver_connection.is_in_transaction():
+            # The asyncpg adapter sends BEGIN with its first statement only; COPY goes
+            # around it and would commit every chunk on its own
+            await db.execute(text("SELECT 1"))
+        for chunk in _chunks(rows):
+            await raw.driver_connection.copy_records_to_table(
+                table.name,
+                records=[tuple(row[name] for name in columns) for row in chunk],
+                columns=columns,
+            )
+    else:
+        # executemany is rendered as multi-row INSERT ... VALUES batches
+        for chunk in _chunks(rows):
+            await db.execute(insert(table), chunk)
+
+
+async def bulk_import(db: AsyncSession, model, schema, rows: list, atomic: bool = False, after_insert=None) -> BulkImportResult:
+    table = model.__table__
+    errors = {}
+    valid = []
+    for number, raw in enumerate(rows, start=1):
+        if isinstance(raw, RowParseError):
+            errors[number] = [str(raw)]
+            continue
+        try:
+            item = schema.model_validate(raw)
+        except ValidationError as e:
+            errors[number] = [
+                f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}"
+                for error in e.errors()
+            ]
+            continue
+        valid.append((number, column_values(table, item.model_dump())))
+
+    valid = await check_references(db, table, valid, errors)
+    valid = await check_unique(db, table, valid, errors)
+
+    inserted = 0
+    if valid and not (atomic and errors):
+        await insert_rows(db, table, [values for _, values in valid])
+        if after_insert is not None:
+            await after_insert(db)
+        await db.commit()
+        inserted = len(valid)
+
+    return BulkImportResult(
+        received=len(rows),
+        inserted=inserted,
+        errors=[BulkRowError(row=number, errors=messages) for number, messages in sorted(errors.items())],
+    )
@@ -0,0 +1,48 @@
+import asyncio
+from typing import Dict, List
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from sqlalchemy import select
+
+from database import AsyncSessionLocal
+from reference_cache import conditional_response, reference_cache
+
+_adapters: Dict[object, TypeAdapter] = {}
+
+
+def dump_rows(schema, rows) -> bytes:
+    adapter = _adapters.get(schema)
+    if adapter is None:
+        adapter = _adapters[schema] = TypeAdapter(List[schema])
+    return adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+
+
+async def fetch_rows(query) -> list:
+    # Every part of a bundle gets its own session, i.e. its own pooled connection,
+    # so the parts run concurrently instead of one after another
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(query)).all()
+
+
+async def fetch_json(query, schema) -> bytes:
+    return dump_rows(schema, await fetch_rows(query))
+
+
+async def reference_json(name: str, model, schema) -> bytes:
+    """The whole reference table as JSON, shared with the list pages through the reference cache."""
+    key = ("all",)
+    entry = reference_cache.get(name, key)
+    if entry is None:
+        version = reference_cache.version(name)
+        order_by = list(model.__mapper__.primary_key)
+        rows = [row[0] for row in await fetch_rows(select(model).order_by(*order_by))]
+        entry = reference_cache.put(name, key, version, List[schema], rows, {})
+    return entry.body
+
+
+async def bundle_response(request: Request, parts: dict, headers: Dict[str, str] = None) -> Response:
+    """Await the part coroutines concurrently and join their JSON into one object."""
+    bodies = await asyncio.gather(*parts.values())
+    body = b"{" + b",".join(b'"%s":%s' % (name.encode(), part) for name, part in zip(parts, bodies)) + b"}"
+    return conditional_response(request, body, headers)
@@ -7,3 +7,61 @@ DB_PORT = os.environ.get("DB_PORT")
 DB_NAME = os.environ.get("DB_NAME")
 DB_USER = os.environ.get("DB_USER")
 DB_PASS = os.environ.get("DB_PASS")
+
+# Overrides the Postgres connection, e.g. "sqlite:///./videorental.db" for a local stand-in
+DATABASE_URL = os.environ.get("DATABASE_URL")
+
+# Connection pool, shared by every engine a worker process creates
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# Open the pool's connections and load the reference cache before a worker takes requests
+STARTUP_WARMUP = os.environ.get("STARTUP_WARMUP", "true").lower() in ("1", "true", "yes")
+# Seconds the warm-up may take; an unreachable host would otherwise hold the worker for the connect timeout
+STARTUP_WARMUP_TIMEOUT = float(os.environ.get("STARTUP_WARMUP_TIMEOUT", 3))
+
+# Fail requests that issue more SQL statements than this (set in tests/dev to catch N+1 queries)
+SQL_STATEMENT_LIMIT = int(os.environ["SQL_STATEMENT_LIMIT"]) if os.environ.get("SQL_STATEMENT_LIMIT") else None
+
+# Seconds a worker may serve cached studios/genres/producers/actors changed by another worker
+REFERENCE_CACHE_TTL = float(os.environ.get("REFERENCE_CACHE_TTL", 60))
+
+# ?count= totals: row counts of the small tables are re-read after ROW_COUNT_TTL seconds
+# (writes of other workers), exact counts of filtered lists are reused for COUNT_CACHE_TTL
+ROW_COUNT_TTL = float(os.environ.get("ROW_COUNT_TTL", 60))
+COUNT_CACHE_TTL = float(os.environ.get("COUNT_CACHE_TTL", 30))
+COUNT_CACHE_SIZE = int(os.environ.get("COUNT_CACHE_SIZE", 256))
+
+# Copies a new film is stocked with
+FILM_DEFAULT_COPIES = int(os.environ.get("FILM_DEFAULT_COPIES", 1))
+
+# bcrypt runs in its own pool so a login burst cannot starve the CRUD endpoints.
+# PASSWORD_HASH_EXECUTOR=process spreads hashing over several cores.
+PASSWORD_HASH_EXECUTOR = os.environ.get("PASSWORD_HASH_EXECUTOR", "thread").lower()
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+# Hash jobs allowed to wait for a worker before logins are answered with 503
+PASSWORD_HASH_QUEUE = int(os.environ.get("PASSWORD_HASH_QUEUE", 64))
+# Stored hashes with fewer rounds are upgraded on the next successful login
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+
+# Секретный ключ для JWT (должен быть защищен)
+# No default: a key everyone knows lets anyone sign an is_admin token. The app
+# refuses to start without it; generate one with `python -c "import secrets; print(secrets.token_urlsafe(32))"`
+SECRET_KEY = os.environ.get("SECRET_KEY")
+ALGORITHM = os.environ.get("JWT_ALGORITHM", "HS256")
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.environ.get("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.environ.get("REFRESH_TOKEN_EXPIRE_DAYS", 7))
+# Decoded access tokens kept per worker, so checking a token costs no signature check or DB lookup
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", 1024))
+
+# Slow-query log, off unless SLOW_QUERY_MS is set: statements slower than this are kept
+# (with passport/phone parameters redacted) and a sampled share gets an EXPLAIN ANALYZE
+SLOW_QUERY_MS = float(os.environ["SLOW_QUERY_MS"]) if os.environ.get("SLOW_QUERY_MS") else None
+SLOW_QUERY_EXPLAIN_RATE = float(os.environ.get("SLOW_QUERY_EXPLAIN_RATE", 0.1))
+SLOW_QUERY_LOG_SIZE = int(os.environ.get("SLOW_QUERY_LOG_SIZE", 100))
+SLOW_QUERY_REDACT = tuple(
+    name.strip().lower() for name in os.environ.get("SLOW_QUERY_REDACT", "passport,phone,password").split(",") if name.strip()
+)
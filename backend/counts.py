@@ -0,0 +1,150 @@
+import json
+import time
+from collections import OrderedDict
+from enum import Enum
+from typing import Dict, Optional
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import COUNT_CACHE_SIZE, COUNT_CACHE_TTL, ROW_COUNT_TTL
+from models.models import Actor, Client, Film, Filmography, Genre, Producer, Studio
+
+TOTAL_COUNT_HEADER = "X-Total-Count"
+# The mode that produced the number; estimated falls back to exact where there is no estimate
+TOTAL_COUNT_MODE_HEADER = "X-Total-Count-Mode"
+
+COUNT_DESCRIPTION = (
+    "Add an X-Total-Count header: exact, estimated (planner statistics, Postgres only) "
+    "or cached (an exact count reused for a while)"
+)
+
+
+class CountMode(str, Enum):
+    exact = "exact"
+    estimated = "estimated"
+    cached = "cached"
+
+
+class RowCounter:
+    """Row counts of the small tables, per worker process.
+
+    Loaded with COUNT(*) on first use and kept current by the create/delete
+    handlers of this worker; writes of other workers show up after the TTL.
+    """
+
+    TABLES = tuple(model.__tablename__ for model in (Studio, Genre, Producer, Actor, Client, Film, Filmography))
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._counts: Dict[str, int] = {}
+        self._loaded: Dict[str, float] = {}
+
+    def counts(self, table: str) -> bool:
+        return table in self.TABLES
+
+    async def get(self, db: AsyncSession, table: str) -> int:
+        loaded = self._loaded.get(table)
+        if loaded is None or time.monotonic() - loaded > self.ttl:
+            count = await db.scalar(select(func.count()).select_from(text(table)))
+            self._counts[table] = count
+            self._loaded[table] = time.monotonic()
+        return self._counts[table]
+
+    def add(self, table: str, delta: int) -> None:
+        if table in self._counts:
+            self._counts[table] += delta
+
+    def invalidate(self, table: str) -> None:
+        self._loaded.pop(table, None)
+        self._counts.pop(table, None)
+
+
+row_counter = RowCounter(ROW_COUNT_TTL)
+
+
+class CountCache:
+    """Exact counts of filtered queries, keyed by their SQL and parameters."""
+
+    def __init__(self, ttl: float, size: int):
+        self.ttl = ttl
+        self.size = size
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+    def get(self, key: tuple) -> Optional[int]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        count, created = entry
+        if time.monotonic() - created > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return count
+
+    def put(self, key: tuple, count: int) -> None:
+        self._entries[key] = (count, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+
+count_cache = CountCache(COUNT_CACHE_TTL, COUNT_CACHE_SIZE)
+
+
+def _compile(db: AsyncSession, query):
+    compiled = query.compile(dialect=db.get_bind().dialect, compile_kwargs={"render_postcompile": True})
+    names = compiled.positiontup or sorted(compiled.params)
+    return str(compiled), tuple(compiled.params[name] for name in names)
+
+
+async def exact_count(db: AsyncSession, query) -> int:
+    return await db.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+
+
+async def _estimate(db: AsyncSession, query, table: Optional[str]) -> Optional[int]:
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    if table is not None:
+        # Kept by VACUUM/ANALYZE; -1 until the table has been analyzed once
+        estimate = await db.scalar(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"), {"table": table}
+        )
+        return estimate if estimate is not None and estimate >= 0 else None
+    statement, parameters = _compile(db, query.order_by(None))
+    connection = await db.connection()
+    plan = (await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def total_count_headers(db: AsyncSession, query, mode: Optional[CountMode], table: Optional[str]) -> Dict[str, str]:
+    """X-Total-Count of ``query``, which must be unpaginated.
+
+    ``table`` is given when the query returns exactly one row per row of that
+    table (no filters, inner joins along NOT NULL keys), so the count can come
+    from the row counter or the table statistics instead of a scan.
+    """
+    if mode is None:
+        return {}
+    used = CountMode.exact
+    if table is not None and row_counter.counts(table):
+        count = await row_counter.get(db, table)
+    elif mode is CountMode.estimated:
+        count = await _estimate(db, query, table)
+        if count is None:
+            count = await exact_count(db, query)
+        else:
+            used = CountMode.estimated
+    elif mode is CountMode.cached:
+        key = _compile(db, query.order_by(None))
+        count = count_cache.get(key)
+        if count is None:
+            count = await exact_count(db, query)
+            count_cache.put(key, count)
+        else:
+            used = CountMode.cached
+    else:
+        count = await exact_count(db, query)
+    return {TOTAL_COUNT_HEADER: str(count), TOTAL_COUNT_MODE_HEADER: used.value}
@@ -0,0 +1,79 @@
+import csv
+import io
+import json
+from datetime import date
+from decimal import Decimal
+from enum import Enum
+
+import orjson
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+
+from database import AsyncSessionLocal
+
+YIELD_PER = 1000
+
+
+class ExportFormat(str, Enum):
+    json = "json"
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv; charset=utf-8",
+}
+
+
+def _json_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def encode_rows(columns, rows) -> bytes:
+    """A JSON array of row objects; orjson writes dates itself and calls back for Decimal."""
+    columns = list(columns)
+    return orjson.dumps([dict(zip(columns, row)) for row in rows], default=_json_default)
+
+
+def json_rows_response(result) -> Response:
+    # Large reports skip building and re-validating a Pydantic object per row;
+    # the route's response_model still documents the shape
+    return Response(encode_rows(result.keys(), result.all()), media_type="application/json")
+
+
+async def _stream_rows(query, format: ExportFormat):
+    # The request's session is closed before the body is sent, so the export
+    # holds its own connection for as long as the server side cursor is open.
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=YIELD_PER))
+        columns = list(result.keys())
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if format is ExportFormat.csv:
+            writer.writerow(columns)
+        async for rows in result.partitions():
+            if format is ExportFormat.csv:
+                writer.writerows(rows)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            else:
+                yield "".join(
+                    json.dumps(dict(zip(columns, row)), default=_json_default, ensure_ascii=False) + "\n"
+                    for row in rows
+                )
+        if format is ExportFormat.csv and buffer.tell():
+            yield buffer.getvalue()
+
+
+def stream_export(query, format: ExportFormat, name: str) -> StreamingResponse:
+    return StreamingResponse(
+        _stream_rows(query, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{format.value}"'},
+    )
@@ -0,0 +1,52 @@
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException, Response
+from pydantic import create_model
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bundles import dump_rows
+from pagination import NEXT_CURSOR_HEADER, next_cursor, paginate, sort_key
+
+
+def parse_fields(fields: str, schema, always: Iterable[str] = ()) -> Tuple[str, ...]:
+    """Names from ``?fields=a,b`` in the schema's order; ``always`` (the sort keys) is added."""
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    if not requested:
+        raise HTTPException(status_code=400, detail="fields must name at least one field")
+    unknown = requested - set(schema.model_fields)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}; available: {', '.join(schema.model_fields)}",
+        )
+    requested.update(always)
+    return tuple(name for name in schema.model_fields if name in requested)
+
+
+@lru_cache(maxsize=256)
+def sparse_schema(schema, names: Tuple[str, ...]):
+    """The schema narrowed to ``names``, with the same field rules and config (date formats)."""
+    return create_model(
+        f"{schema.__name__}Fields",
+        __config__=schema.model_config,
+        **{name: (schema.model_fields[name].annotation, schema.model_fields[name]) for name in names},
+    )
+
+
+def select_fields(query, names: Tuple[str, ...]):
+    # The joins stay, only the column list shrinks, so unrequested columns
+    # (film_annotation, passports) are never read from the database
+    return query.with_only_columns(*(column for column in query.selected_columns if column.key in names))
+
+
+async def sparse_page(
+    db: AsyncSession, query, order_by: List, schema, fields: str, skip: int, limit: int, after: Optional[str], headers: Dict[str, str]
+) -> Response:
+    """A page of ``query`` with only the requested columns; the sort columns are always included."""
+    names = parse_fields(fields, schema, [sort_key(item)[0].key for item in order_by])
+    rows = (await db.execute(paginate(select_fields(query, names), order_by, skip, limit, after))).all()
+    cursor = next_cursor(rows, order_by, limit)
+    if cursor:
+        headers = {**headers, NEXT_CURSOR_HEADER: cursor}
+    return Response(dump_rows(sparse_schema(schema, names), rows), media_type="application/json", headers=headers)
@@ -1,15 +1,44 @@
-from datetime import datetime, timedelta
-from fastapi import FastAPI, Depends, HTTPException
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
 from pydantic import BaseModel
-from sqlalchemy import func, select, text
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from fastapi.middleware.cors import CORSMiddleware
 
-from database import SessionLocal, engine
-from models.models import Base, Moderator, Studio, Genre, Producer, Actor, Client, Film, Filmography, Journal
+from auth import REFRESH, claims_cache, create_tokens, decode_token, get_optional_claims, require_admin, require_cashier
+from batch import run_batch
+from bulk import bulk_import, read_rows
+from bundles import bundle_response, dump_rows, fetch_json, fetch_rows, reference_json
+from config import SECRET_KEY, SQL_STATEMENT_LIMIT, STARTUP_WARMUP, STARTUP_WARMUP_TIMEOUT
+from counts import COUNT_DESCRIPTION, TOTAL_COUNT_HEADER, TOTAL_COUNT_MODE_HEADER, CountMode, row_counter, total_count_headers
+from database import AsyncSessionLocal, async_engine, engine, prefill_pool
+from db_pool import pool_status
+import metrics
+from metrics import MetricsMiddleware
+import open_rentals
+import passwords
+import stock
+from query_counter import StatementLimitMiddleware
+from fields import sparse_page, sparse_schema
+from filters import ListQuery
+from export import ExportFormat, encode_rows, json_rows_response, stream_export
+from pagination import NEXT_CURSOR_HEADER, next_cursor, paginate, set_next_cursor
+from reference_cache import conditional_response, reference_cache
+from search import search_films
+from slow_queries import slow_query_log
+from models.models import Moderator, Studio, Genre, Producer, Actor, Client, Film, Filmography, Journal, OpenRental, FilmStock
 from schemas import (
+    BatchRequest,
+    BatchResult,
+    BulkImportResult,
+    FilmSearchResult,
     FilmGenreResponse,
+    FilmStockRead,
+    FilmStockUpdate,
     FilmResponse,
     FilmographyDetailed,
     ModeratorCreate,
@@ -36,10 +65,39 @@ from schemas import (
 )
 from schemas import JournalDetailed
 
-# Create the tables
-Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# The schema belongs to Alembic (support files/create-script.sql, then
+# `alembic upgrade head`); importing the app touches no database.
+
+
+async def warm_up():
+    # A worker that can't reach the database still starts; its requests fail until it can
+    try:
+        await prefill_pool()
+        for name, model, schema in REFERENCES:
+            await reference_json(name, model, schema)
+    except (OSError, SQLAlchemyError) as error:
+        logger.warning("Warm-up skipped, the database is not available: %s", error)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if not SECRET_KEY:
+        raise RuntimeError("SECRET_KEY is not set, see config.py")
+    if STARTUP_WARMUP:
+        try:
+            await asyncio.wait_for(warm_up(), STARTUP_WARMUP_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("Warm-up skipped, the database did not answer within %s s", STARTUP_WARMUP_TIMEOUT)
+    try:
+        yield
+    finally:
+        passwords.shutdown()
+        await async_engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -48,321 +106,473 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # разрешает все методы (GET, POST, PUT, DELETE и т.д.)
     allow_headers=["*"],  # разрешает все заголовки
+    expose_headers=[NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, TOTAL_COUNT_MODE_HEADER, "Content-Disposition", "ETag"],
 )
 
+if SQL_STATEMENT_LIMIT is not None:
+    app.add_middleware(StatementLimitMiddleware, limit=SQL_STATEMENT_LIMIT)
+
+# Outermost, so the latency covers the other middleware as well
+app.add_middleware(MetricsMiddleware)
+
+# ?fields= on the list routes narrows both the SELECT and the response (see fields.py)
+FIELDS_QUERY = Query(None, description="Comma separated fields to return, e.g. film_id,film_name; the id is always included")
+COUNT_QUERY = Query(None, description=COUNT_DESCRIPTION)
+
 # Dependency to get the DB session
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+# Studios, genres, producers and actors change rarely: pages are served from
+# the reference cache and revalidated by the browser with ETags.
+REFERENCES = (
+    ("studios", Studio, StudioSchema),
+    ("genres", Genre, GenreSchema),
+    ("producers", Producer, ProducerSchema),
+    ("actors", Actor, ActorSchema),
+)
+
+
+async def read_reference_page(request: Request, name: str, model, schema, skip: int, limit: int, after: Optional[str], count: Optional[CountMode], db: AsyncSession):
+    key = (skip, limit, after, count)
+    entry = reference_cache.get(name, key)
+    if entry is None:
+        version = reference_cache.version(name)
+        order_by = list(model.__mapper__.primary_key)
+        rows = (await db.scalars(paginate(select(model), order_by, skip, limit, after))).all()
+        cursor = next_cursor(rows, order_by, limit)
+        headers = {NEXT_CURSOR_HEADER: cursor} if cursor else {}
+        headers.update(await total_count_headers(db, select(model), count, model.__tablename__))
+        entry = reference_cache.put(name, key, version, List[schema], rows, headers)
+    return conditional_response(request, entry.body, entry.headers)
 
 # Studio CRUD operations
 @app.post("/studios/", response_model=StudioSchema)
-def create_studio(studio: StudioCreateSchema, db: Session = Depends(get_db)):
-    db_studio = Studio(**studio.dict())
-    db.add(db_studio)
-    db.commit()
-    db.refresh(db_studio)
+async def create_studio(studio: StudioCreateSchema, db: AsyncSession = Depends(get_db)):
+    db_studio = await db.scalar(insert(Studio).values(**studio.dict()).returning(Studio))
+    await db.commit()
+    row_counter.add("studio", 1)
+    reference_cache.invalidate("studios")
     return db_studio
 
 @app.get("/studios/", response_model=List[StudioSchema])
-def read_studios(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return db.query(Studio).offset(skip).limit(limit).all()
+async def read_studios(request: Request, skip: int = 0, limit: int = 10, after: Optional[str] = None, count: Optional[CountMode] = COUNT_QUERY, db: AsyncSession = Depends(get_db)):
+    return await read_reference_page(request, "studios", Studio, StudioSchema, skip, limit, after, count, db)
 
 @app.put("/studios/{studio_id}", response_model=StudioSchema)
-def update_studio(studio_id: int, studio: StudioCreateSchema, db: Session = Depends(get_db)):
-    db_studio = db.query(Studio).filter(Studio.studio_id == studio_id).first()
+async def update_studio(studio_id: int, studio: StudioCreateSchema, db: AsyncSession = Depends(get_db)):
+    db_studio = await db.scalar(
+        update(Studio).where(Studio.studio_id == studio_id).values(**studio.dict()).returning(Studio)
+    )
     if db_studio is None:
         raise HTTPException(status_code=404, detail="Studio not found")
-    
-    for key, value in studio.dict().items():
-        setattr(db_studio, key, value)
 
-    db.commit()
-    db.refresh(db_studio)
+    await db.commit()
+    reference_cache.invalidate("studios")
     return db_studio
 
 @app.delete("/studios/{studio_id}")
-def delete_studio(studio_id: int, db: Session = Depends(get_db)):
-    db_studio = db.query(Studio).filter(Studio.studio_id == studio_id).first()
+async def delete_studio(studio_id: int, db: AsyncSession = Depends(get_db)):
+    db_studio = await db.get(Studio, studio_id)
     if db_studio is None:
         raise HTTPException(status_code=404, detail="Studio not found")
     
-    related_films = db.query(Film).filter(Film.studio_id == studio_id).first()
+    related_films = await db.scalar(select(Film.film_id).where(Film.studio_id == studio_id).limit(1))
     if related_films:
         raise HTTPException(status_code=400, detail="Невозможно удалить строку, пока есть зависимые данные в других таблицах")
 
-    db.delete(db_studio)
-    db.commit()
+    await db.delete(db_studio)
+    await db.commit()
+    row_counter.add("studio", -1)
+    reference_cache.invalidate("studios")
     return {"detail": "Studio deleted successfully"}
 
 # Genre CRUD operations
 @app.post("/genres/", response_model=GenreSchema)
-def create_genre(genre: GenreCreateSchema, db: Session = Depends(get_db)):
-    db_genre = Genre(**genre.dict())
-    db.add(db_genre)
-    db.commit()
-    db.refresh(db_genre)
+async def create_genre(genre: GenreCreateSchema, db: AsyncSession = Depends(get_db)):
+    db_genre = await db.scalar(insert(Genre).values(**genre.dict()).returning(Genre))
+    await db.commit()
+    row_counter.add("genre", 1)
+    reference_cache.invalidate("genres")
     return db_genre
 
 @app.get("/genres/", response_model=List[GenreSchema])
-def read_genres(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return db.query(Genre).offset(skip).limit(limit).all()
+async def read_genres(request: Request, skip: int = 0, limit: int = 10, after: Optional[str] = None, count: Optional[CountMode] = COUNT_QUERY, db: AsyncSession = Depends(get_db)):
+    return await read_reference_page(request, "genres", Genre, GenreSchema, skip, limit, after, count, db)
 
 @app.put("/genres/{genre_id}", response_model=GenreSchema)
-def update_genre(genre_id: int, genre: GenreCreateSchema, db: Session = Depends(get_db)):
-    db_genre = db.query(Genre).filter(Genre.genre_id == genre_id).first()
+async def update_genre(genre_id: int, genre: GenreCreateSchema, db: AsyncSession = Depends(get_db)):
+    db_genre = await db.scalar(
+        update(Genre).where(Genre.genre_id == genre_id).values(**genre.dict()).returning(Genre)
+    )
     if db_genre is None:
         raise HTTPException(status_code=404, detail="Genre not found")
-    
-    for key, value in genre.dict().items():
-        setattr(db_genre, key, value)
 
-    db.commit()
-    db.refresh(db_genre)
+    await db.commit()
+    reference_cache.invalidate("genres")
     return db_genre
 
 @app.delete("/genres/{genre_id}")
-def delete_genre(genre_id: int, db: Session = Depends(get_db)):
-    db_genre = db.query(Genre).filter(Genre.genre_id == genre_id).first()
+async def delete_genre(genre_id: int, db: AsyncSession = Depends(get_db)):
+    db_genre = await db.get(Genre, genre_id)
     if db_genre is None:
         raise HTTPException(status_code=404, detail="Genre not found")
     
-    related_films = db.query(Film).filter(Film.genre_id == genre_id).first()
+    related_films = await db.scalar(select(Film.film_id).where(Film.genre_id == genre_id).limit(1))
     if related_films:
         raise HTTPException(status_code=400, detail="Невозможно удалить жанр, пока есть зависимые данные в других таблицах")
 
-    db.delete(db_genre)
-    db.commit()
+    await db.delete(db_genre)
+    await db.commit()
+    row_counter.add("genre", -1)
+    reference_cache.invalidate("genres")
     return {"detail": "Genre deleted successfully"}
 
 # Producer CRUD operations
 @app.post("/producers/", response_model=ProducerSchema)
-def create_producer(producer: ProducerCreateSchema, db: Session = Depends(get_db)):
-    db_producer = Producer(**producer.dict())
-    db.add(db_producer)
-    db.commit()
-    db.refresh(db_producer)
+async def create_producer(producer: ProducerCreateSchema, db: AsyncSession = Depends(get_db)):
+    db_producer = await db.scalar(insert(Producer).values(**producer.dict()).returning(Producer))
+    await db.commit()
+    row_counter.add("producer", 1)
+    reference_cache.invalidate("producers")
     return db_producer
 
 @app.get("/producers/", response_model=List[ProducerSchema])
-def read_producers(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return db.query(Producer).offset(skip).limit(limit).all()
+async def read_producers(request: Request, skip: int = 0, limit: int = 10, after: Optional[str] = None, count: Optional[CountMode] = COUNT_QUERY, db: AsyncSession = Depends(get_db)):
+    return await read_reference_page(request, "producers", Producer, ProducerSchema, skip, limit, after, count, db)
 
 @app.put("/producers/{producer_id}", response_model=ProducerSchema)
-def update_producer(producer_id: int, producer: ProducerCreateSchema, db: Session = Depends(get_db)):
-    db_producer = db.query(Producer).filter(Producer.producer_id == producer_id).first()
+async def update_producer(producer_id: int, producer: ProducerCreateSchema, db: AsyncSession = Depends(get_db)):
+    db_producer = await db.scalar(
+        update(Producer).where(Producer.producer_id == producer_id).values(**producer.dict()).returning(Producer)
+    )
     if db_producer is None:
         raise HTTPException(status_code=404, detail="Producer not found")
-    
-    for key, value in producer.dict().items():
-        setattr(db_producer, key, value)
 
-    db.commit()
-    db.refresh(db_producer)
+    await db.commit()
+    reference_cache.invalidate("producers")
     return db_producer
 
 @app.delete("/producers/{producer_id}")
-def delete_producer(producer_id: int, db: Session = Depends(get_db)):
-    db_producer = db.query(Producer).filter(Producer.producer_id == producer_id).first()
+async def delete_producer(producer_id: int, db: AsyncSession = Depends(get_db)):
+    db_producer = await db.get(Producer, producer_id)
     if db_producer is None:
         raise HTTPException(status_code=404, detail="Producer not found")
     
-    related_films = db.query(Film).filter(Film.producer_id == producer_id).first()
+    related_films = await db.scalar(select(Film.film_id).where(Film.producer_id == producer_id).limit(1))
     if related_films:
         raise HTTPException(status_code=400, detail="Невозможно удалить режиссера, пока есть зависимые данные в других таблицах")
 
-    db.delete(db_producer)
-    db.commit()
+    await db.delete(db_producer)
+    await db.commit()
+    row_counter.add("producer", -1)
+    reference_cache.invalidate("producers")
     return {"detail": "Producer deleted successfully"}
 
 
 # Actor CRUD operations
 @app.post("/actors/", response_model=ActorSchema)
-def create_actor(actor: ActorCreateSchema, db: Session = Depends(get_db)):
-    db_actor = Actor(**actor.dict())
-    db.add(db_actor)
-    db.commit()
-    db.refresh(db_actor)
+async def create_actor(actor: ActorCreateSchema, db: AsyncSession = Depends(get_db)):
+    db_actor = await db.scalar(insert(Actor).values(**actor.dict()).returning(Actor))
+    await db.commit()
+    row_counter.add("actor", 1)
+    reference_cache.invalidate("actors")
     return db_actor
 
+@app.post("/actors/bulk", response_model=BulkImportResult)
+async def import_actors(request: Request, atomic: bool = False, db: AsyncSession = Depends(get_db)):
+    result = await bulk_import(db, Actor, ActorCreateSchema, await read_rows(request), atomic)
+    reference_cache.invalidate("actors")
+    row_counter.add("actor", result.inserted)
+    return result
+
 @app.get("/actors/", response_model=List[ActorSchema])
-def read_actors(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return db.query(Actor).offset(skip).limit(limit).all()
+async def read_actors(request: Request, skip: int = 0, limit: int = 10, after: Optional[str] = None, count: Optional[CountMode] = COUNT_QUERY, db: AsyncSession = Depends(get_db)):
+    return await read_reference_page(request, "actors", Actor, ActorSchema, skip, limit, after, count, db)
 
 @app.put("/actors/{actor_id}", response_model=ActorSchema)
-def update_actor(actor_id: int, actor: ActorCreateSchema, db: Session = Depends(get_db)):
-    db_actor = db.query(Actor).filter(Actor.actor_id == actor_id).first()
+async def update_actor(actor_id: int, actor: ActorCreateSchema, db: AsyncSession = Depends(get_db)):
+    db_actor = await db.scalar(
+        update(Actor).where(Actor.actor_id == actor_id).values(**actor.dict()).returning(Actor)
+    )
     if db_actor is None:
         raise HTTPException(status_code=404, detail="Actor not found")
-    
-    for key, value in actor.dict().items():
-        setattr(db_actor, key, value)
 
-    db.commit()
-    db.refresh(db_actor)
+    await db.commit()
+    reference_cache.invalidate("actors")
     return db_actor
 
 @app.delete("/actors/{actor_id}")
-def delete_actor(actor_id: int, db: Session = Depends(get_db)):
-    db_actor = db.query(Actor).filter(Actor.actor_id == actor_id).first()
+async def delete_actor(actor_id: int, db: AsyncSession = Depends(get_db)):
+    db_actor = await db.get(Actor, actor_id)
     if db_actor is None:
         raise HTTPException(status_code=404, detail="Actor not found")
     
-    related_films = db.query(Film).join(Filmography).filter(Filmography.actor_id == actor_id).first()
+    related_films = await db.scalar(select(Film.film_id).join(Filmography).where(Filmography.actor_id == actor_id).limit(1))
     if related_films:
         raise HTTPException(status_code=400, detail="Невозможно удалить актёра, пока есть зависимые данные в других таблицах")
 
-    db.delete(db_actor)
-    db.commit()
+    await db.delete(db_actor)
+    await db.commit()
+    row_counter.add("actor", -1)
+    reference_cache.invalidate("actors")
     return {"detail": "Actor deleted successfully"}
 
 # Client CRUD operations
 @app.post("/clients/", response_model=ClientSchema)
-def create_client(client: ClientCreateSchema, db: Session = Depends(get_db)):
-    db_client = Client(**client.dict())
-    db.add(db_client)
-    db.commit()
-    db.refresh(db_client)
+async def create_client(client: ClientCreateSchema, db: AsyncSession = Depends(get_db)):
+    db_client = await db.scalar(insert(Client).values(**client.dict()).returning(Client))
+    await db.commit()
+    row_counter.add("client", 1)
     return db_client
 
+@app.post("/clients/bulk", response_model=BulkImportResult)
+async def import_clients(request: Request, atomic: bool = False, db: AsyncSession = Depends(get_db)):
+    result = await bulk_import(db, Client, ClientCreateSchema, await read_rows(request), atomic)
+    row_counter.add("client", result.inserted)
+    return result
+
 @app.get("/clients/", response_model=List[ClientSchema])
-def read_clients(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return db.query(Client).offset(skip).limit(limit).all()
+async def read_clients(response: Response, skip: int = 0, limit: int = 10, after: Optional[str] = None, fields: Optional[str] = FIELDS_QUERY, listing: ListQuery = Depends(), db: AsyncSession = Depends(get_db)):
+    query, order_by = listing.apply(select(Client), Client.client_id)
+    count_headers = await listing.total_count(db, query, Client)
+    if fields is not None:
+        return await sparse_page(db, query, order_by, ClientSchema, fields, skip, limit, after, count_headers)
+    clients = (await db.scalars(paginate(query, order_by, skip, limit, after))).all()
+    set_next_cursor(response, clients, order_by, limit)
+    response.headers.update(count_headers)
+    return clients
 
 
 @app.put("/clients/{client_id}", response_model=ClientSchema)
-def update_client(client_id: int, client: ClientCreateSchema, db: Session = Depends(get_db)):
-    db_client = db.query(Client).filter(Client.client_id == client_id).first()
+async def update_client(client_id: int, client: ClientCreateSchema, db: AsyncSession = Depends(get_db)):
+    db_client = await db.scalar(
+        update(Client).where(Client.client_id == client_id).values(**client.dict()).returning(Client)
+    )
     if db_client is None:
         raise HTTPException(status_code=404, detail="Client not found")
-    
-    for key, value in client.dict().items():
-        setattr(db_client, key, value)
 
-    db.commit()
-    db.refresh(db_client)
+    await open_rentals.sync_client(db, db_client)
+    await db.commit()
     return db_client
 
 @app.delete("/clients/{client_id}")
-def delete_client(client_id: int, db: Session = Depends(get_db)):
-    db_client = db.query(Client).filter(Client.client_id == client_id).first()
+async def delete_client(client_id: int, db: AsyncSession = Depends(get_db)):
+    db_client = await db.get(Client, client_id)
     if db_client is None:
         raise HTTPException(status_code=404, detail="Client not found")
     
-    related_orders = db.query(Journal).filter(Journal.client_id == client_id).first()
+    related_orders = await db.scalar(select(Journal.journal_id).where(Journal.client_id == client_id).limit(1))
     if related_orders:
         raise HTTPException(status_code=400, detail="Невозможно удалить клиента, пока есть зависимые данные в других таблицах")
 
-    db.delete(db_client)
-    db.commit()
+    await db.delete(db_client)
+    await db.commit()
+    row_counter.add("client", -1)
     return {"detail": "Client deleted successfully"}
 
 
 # Film CRUD operations
 @app.post("/films/", response_model=FilmBasicSchema)
-def create_film(film: FilmCreateSchema, db: Session = Depends(get_db)):
-    db_film = Film(**film.dict())
-    db.add(db_film)
-    db.commit()
-    db.refresh(db_film)
+async def create_film(film: FilmCreateSchema, db: AsyncSession = Depends(get_db)):
+    db_film = await db.scalar(insert(Film).values(**film.dict()).returning(Film))
+    await stock.add_film(db, db_film.film_id)
+    await db.commit()
+    row_counter.add("film", 1)
     return db_film
 
+@app.post("/films/bulk", response_model=BulkImportResult)
+async def import_films(request: Request, atomic: bool = False, db: AsyncSession = Depends(get_db)):
+    result = await bulk_import(
+        db, Film, FilmCreateSchema, await read_rows(request), atomic,
+        after_insert=stock.add_missing,
+    )
+    row_counter.add("film", result.inserted)
+    return result
+
 @app.get("/films/", response_model=List[FilmBasicSchema])
-def read_films(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return db.query(Film).offset(skip).limit(limit).all()
+async def read_films(response: Response, skip: int = 0, limit: int = 10, after: Optional[str] = None, fields: Optional[str] = FIELDS_QUERY, listing: ListQuery = Depends(), db: AsyncSession = Depends(get_db)):
+    query, order_by = listing.apply(select(Film), Film.film_id)
+    count_headers = await listing.total_count(db, query, Film)
+    if fields is not None:
+        return await sparse_page(db, query, order_by, FilmBasicSchema, fields, skip, limit, after, count_headers)
+    films = (await db.scalars(paginate(query, order_by, skip, limit, after))).all()
+    set_next_cursor(response, films, order_by, limit)
+    response.headers.update(count_headers)
+    return films
 
 
 @app.put("/films/{film_id}", response_model=FilmBasicSchema)
-def update_film(film_id: int, film: FilmCreateSchema, db: Session = Depends(get_db)):
-    db_film = db.query(Film).filter(Film.film_id == film_id).first()
+async def update_film(film_id: int, film: FilmCreateSchema, db: AsyncSession = Depends(get_db)):
+    db_film = await db.scalar(
+        update(Film).where(Film.film_id == film_id).values(**film.dict()).returning(Film)
+    )
     if db_film is None:
         raise HTTPException(status_code=404, detail="Film not found")
-    
-    for key, value in film.dict().items():
-        setattr(db_film, key, value)
 
-    db.commit()
-    db.refresh(db_film)
+    await open_rentals.sync_film(db, db_film)
+    await db.commit()
     return db_film
 
 @app.delete("/films/{film_id}")
-def delete_film(film_id: int, db: Session = Depends(get_db)):
-    db_film = db.query(Film).filter(Film.film_id == film_id).first()
+async def delete_film(film_id: int, db: AsyncSession = Depends(get_db)):
+    db_film = await db.get(Film, film_id)
     if db_film is None:
         raise HTTPException(status_code=404, detail="Film not found")
     
-    related_rentals = db.query(Journal).filter(Journal.film_id == film_id).first()
+    related_rentals = await db.scalar(select(Journal.journal_id).where(Journal.film_id == film_id).limit(1))
     if related_rentals:
         raise HTTPException(status_code=400, detail="Невозможно удалить фильм, пока есть зависимые данные")
 
-    db.delete(db_film)
-    db.commit()
+    await db.delete(db_film)
+    await db.commit()
+    row_counter.add("film", -1)
+    # The film's filmography rows go with it (ON DELETE CASCADE)
+    row_counter.invalidate("filmography")
     return {"detail": "Film deleted successfully"}
 
+# Availability: film_stock has a row per film, ix_film_stock_available covers
+# the films with a copy on the shelf
+@app.get("/films/available", response_model=List[FilmBasicSchema])
+async def read_available_films(response: Response, skip: int = 0, limit: int = 10, after: Optional[str] = None, listing: ListQuery = Depends(), db: AsyncSession = Depends(get_db)):
+    available = select(Film).join(FilmStock, FilmStock.film_id == Film.film_id).where(FilmStock.available > 0)
+    query, order_by = listing.apply(available, Film.film_id)
+    count_headers = await listing.total_count(db, query, None)
+    films = (await db.scalars(paginate(query, order_by, skip, limit, after))).all()
+    set_next_cursor(response, films, order_by, limit)
+    response.headers.update(count_headers)
+    return films
+
+def film_stock_query():
+    return select(FilmStock.film_id, FilmStock.copies, FilmStock.available, (FilmStock.available > 0).label("is_available"))
+
+@app.get("/films/{film_id}/stock", response_model=FilmStockRead)
+async def read_film_stock(film_id: int, db: AsyncSession = Depends(get_db)):
+    film_stock = (await db.execute(film_stock_query().where(FilmStock.film_id == film_id))).first()
+    if film_stock is None:
+        raise HTTPException(status_code=404, detail="Film not found")
+    return film_stock
+
+@app.put("/films/{film_id}/stock", response_model=FilmStockRead, dependencies=[Depends(require_cashier)])
+async def update_film_stock(film_id: int, film_stock: FilmStockUpdate, db: AsyncSession = Depends(get_db)):
+    if await stock.set_copies(db, film_id, film_stock.copies) is None:
+        if await db.get(FilmStock, film_id) is None:
+            raise HTTPException(status_code=404, detail="Film not found")
+        raise HTTPException(status_code=400, detail="Копий не может быть меньше, чем фильмов на руках")
+    await db.commit()
+    return (await db.execute(film_stock_query().where(FilmStock.film_id == film_id))).first()
+
 # Journal CRUD operations
+async def reserve_copy(db: AsyncSession, film_id: int):
+    # An open rental takes a copy off the shelf; the stock row stays locked until the commit
+    if not await stock.reserve(db, film_id):
+        if await db.scalar(select(Film.film_id).where(Film.film_id == film_id)) is None:
+            raise HTTPException(status_code=404, detail="Film not found")
+        raise HTTPException(status_code=409, detail="Нет свободных копий фильма")
+
 @app.post("/journals/", response_model=JournalSchema)
-def create_journal(journal: JournalCreateSchema, db: Session = Depends(get_db)):
-    db_journal = Journal(**journal.dict())
-    db.add(db_journal)
-    db.commit()
-    db.refresh(db_journal)
+async def create_journal(journal: JournalCreateSchema, db: AsyncSession = Depends(get_db)):
+    if journal.journal_refund is False:
+        await reserve_copy(db, journal.film_id)
+    db_journal = await db.scalar(insert(Journal).values(**journal.dict()).returning(Journal))
+    await open_rentals.sync_journal(db, db_journal.journal_id)
+    await db.commit()
     return db_journal
 
+@app.post("/journals/bulk", response_model=BulkImportResult)
+async def import_journals(request: Request, atomic: bool = False, db: AsyncSession = Depends(get_db)):
+    return await bulk_import(
+        db, Journal, JournalCreateSchema, await read_rows(request), atomic,
+        after_insert=open_rentals.sync_missing,
+    )
+
 @app.get("/journals/", response_model=List[JournalSchema])
-def read_journals(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return db.query(Journal).offset(skip).limit(limit).all()
+async def read_journals(response: Response, skip: int = 0, limit: int = 10, after: Optional[str] = None, listing: ListQuery = Depends(), db: AsyncSession = Depends(get_db)):
+    query, order_by = listing.apply(select(Journal), Journal.journal_id)
+    count_headers = await listing.total_count(db, query, Journal)
+    journals = (await db.scalars(paginate(query, order_by, skip, limit, after))).all()
+    set_next_cursor(response, journals, order_by, limit)
+    response.headers.update(count_headers)
+    return journals
 
 @app.put("/journals/{journal_id}", response_model=JournalSchema)
-def update_journal(journal_id: int, journal: JournalCreateSchema, db: Session = Depends(get_db)):
-    db_journal = db.query(Journal).filter(Journal.journal_id == journal_id).first()
+async def update_journal(journal_id: int, journal: JournalCreateSchema, db: AsyncSession = Depends(get_db)):
+    current = (await db.execute(
+        select(Journal.film_id, Journal.journal_refund).where(Journal.journal_id == journal_id)
+    )).first()
+    if current is None:
+        raise HTTPException(status_code=404, detail="Journal not found")
+    # Reopening a rental or moving an open one to another film needs a copy of that film
+    holds_copy = current.journal_refund is False and current.film_id == journal.film_id
+    if journal.journal_refund is False and not holds_copy:
+        await reserve_copy(db, journal.film_id)
+
+    db_journal = await db.scalar(
+        update(Journal).where(Journal.journal_id == journal_id).values(**journal.dict()).returning(Journal)
+    )
     if db_journal is None:
         raise HTTPException(status_code=404, detail="Journal not found")
-    
-    for key, value in journal.dict().items():
-        setattr(db_journal, key, value)
 
-    db.commit()
-    db.refresh(db_journal)
+    await open_rentals.sync_journal(db, journal_id)
+    await db.commit()
     return db_journal
 
 @app.delete("/journals/{journal_id}")
-def delete_journal(journal_id: int, db: Session = Depends(get_db)):
-    db_journal = db.query(Journal).filter(Journal.journal_id == journal_id).first()
+async def delete_journal(journal_id: int, db: AsyncSession = Depends(get_db)):
+    db_journal = await db.get(Journal, journal_id)
     if db_journal is None:
         raise HTTPException(status_code=404, detail="Journal not found")
     
-    db.delete(db_journal)
-    db.commit()
+    await open_rentals.drop_journals(db, [journal_id])
+    await db.delete(db_journal)
+    await db.commit()
     return {"detail": "Journal deleted successfully"}
 
 
-@app.get("/journals_detailed/", response_model=List[JournalDetailed])
-def read_journals_detailed(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    journals = (
-        db.query(
+# Many creates/updates/deletes across entities in one transaction, e.g. re-pricing films
+@app.post("/batch", response_model=BatchResult)
+async def run_batch_operations(batch: BatchRequest, response: Response, db: AsyncSession = Depends(get_db)):
+    result = await run_batch(db, batch.operations)
+    if not result.committed:
+        response.status_code = 422
+    return result
+
+
+def journals_detailed_query():
+    return (
+        select(
             Journal.journal_id,
             Film.film_name,
-            func.concat(Client.client_first_name, ' ', Client.client_last_name).label('client_full_name'),
+            (Client.client_first_name + ' ' + Client.client_last_name).label('client_full_name'),
             Journal.journal_date_issue,
             Journal.journal_date_return,
             Journal.journal_refund
         )
         .join(Film, Journal.film_id == Film.film_id)
         .join(Client, Journal.client_id == Client.client_id)
-        .order_by(Journal.journal_id)
-        .offset(skip)
-        .limit(limit)
-        .all()
     )
+
+@app.get("/journals_detailed/", response_model=List[JournalDetailed])
+async def read_journals_detailed(response: Response, skip: int = 0, limit: int = 100, after: Optional[str] = None, fields: Optional[str] = FIELDS_QUERY, listing: ListQuery = Depends(), db: AsyncSession = Depends(get_db)):
+    query, order_by = listing.apply(journals_detailed_query(), Journal.journal_id)
+    count_headers = await listing.total_count(db, query, Journal)
+    if fields is not None:
+        return await sparse_page(db, query, order_by, JournalDetailed, fields, skip, limit, after, count_headers)
+    journals = (await db.execute(paginate(query, order_by, skip, limit, after))).all()
+    set_next_cursor(response, journals, order_by, limit)
+    response.headers.update(count_headers)
     return journals
 
-@app.get("/films_detailed/", response_model=List[FilmDetailedSchema])
-def read_films_detailed(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    films = (
-        db.query(
+@app.get("/journals_detailed/export")
+async def export_journals_detailed(format: ExportFormat = ExportFormat.ndjson):
+    if format is ExportFormat.json:
+        raise HTTPException(status_code=400, detail="Use /journals_detailed/ for paginated JSON")
+    return stream_export(journals_detailed_query().order_by(Journal.journal_id), format, "journals")
+
+def films_detailed_query():
+    return (
+        select(
             Film.film_id,
             Studio.studio_name,
             Genre.genre_name,
@@ -375,129 +585,194 @@ def read_films_detailed(skip: int = 0, limit: int = 100, db: Session = Depends(g
         .join(Studio, Film.studio_id == Studio.studio_id)
         .join(Genre, Film.genre_id == Genre.genre_id)
         .join(Producer, Film.producer_id == Producer.producer_id)
-        .order_by(Film.film_id)
-        .offset(skip)
-        .limit(limit)
-        .all()
     )
+
+@app.get("/films_detailed/", response_model=List[FilmDetailedSchema])
+async def read_films_detailed(response: Response, skip: int = 0, limit: int = 100, after: Optional[str] = None, fields: Optional[str] = FIELDS_QUERY, listing: ListQuery = Depends(), db: AsyncSession = Depends(get_db)):
+    query, order_by = listing.apply(films_detailed_query(), Film.film_id)
+    count_headers = await listing.total_count(db, query, Film)
+    if fields is not None:
+        return await sparse_page(db, query, order_by, FilmDetailedSchema, fields, skip, limit, after, count_headers)
+    films = (await db.execute(paginate(query, order_by, skip, limit, after))).all()
+    set_next_cursor(response, films, order_by, limit)
+    response.headers.update(count_headers)
     return films
 
 @app.post("/filmographies/", response_model=FilmographySchema)
-def create_filmography(filmography: FilmographyCreateSchema, db: Session = Depends(get_db)):
-    db_filmography = Filmography(**filmography.dict())
-    db.add(db_filmography)
-    db.commit()
-    db.refresh(db_filmography)
+async def create_filmography(filmography: FilmographyCreateSchema, db: AsyncSession = Depends(get_db)):
+    db_filmography = await db.scalar(insert(Filmography).values(**filmography.dict()).returning(Filmography))
+    await db.commit()
+    row_counter.add("filmography", 1)
     return db_filmography
 
+@app.post("/filmographies/bulk", response_model=BulkImportResult)
+async def import_filmographies(request: Request, atomic: bool = False, db: AsyncSession = Depends(get_db)):
+    result = await bulk_import(db, Filmography, FilmographyCreateSchema, await read_rows(request), atomic)
+    row_counter.add("filmography", result.inserted)
+    return result
+
 @app.get("/filmographies/", response_model=List[FilmographySchema])
-def read_filmographies(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return db.query(Filmography).offset(skip).limit(limit).all()
+async def read_filmographies(response: Response, skip: int = 0, limit: int = 10, after: Optional[str] = None, listing: ListQuery = Depends(), db: AsyncSession = Depends(get_db)):
+    query, order_by = listing.apply(select(Filmography), Filmography.filmography_id)
+    count_headers = await listing.total_count(db, query, Filmography)
+    filmographies = (await db.scalars(paginate(query, order_by, skip, limit, after))).all()
+    set_next_cursor(response, filmographies, order_by, limit)
+    response.headers.update(count_headers)
+    return filmographies
 
 
 @app.put("/filmographies/{filmography_id}", response_model=FilmographySchema)
-def update_filmography(filmography_id: int, filmography: FilmographyCreateSchema, db: Session = Depends(get_db)):
-    db_filmography = db.query(Filmography).filter(Filmography.filmography_id == filmography_id).first()
+async def update_filmography(filmography_id: int, filmography: FilmographyCreateSchema, db: AsyncSession = Depends(get_db)):
+    db_filmography = await db.scalar(
+        update(Filmography).where(Filmography.filmography_id == filmography_id).values(**filmography.dict()).returning(Filmography)
+    )
     if db_filmography is None:
         raise HTTPException(status_code=404, detail="Filmography not found")
 
-    for key, value in filmography.dict().items():
-        setattr(db_filmography, key, value)
-
-    db.commit()
-    db.refresh(db_filmography)
+    await db.commit()
     return db_filmography
 
 @app.delete("/filmographies/{filmography_id}")
-def delete_filmography(filmography_id: int, db: Session = Depends(get_db)):
-    db_filmography = db.query(Filmography).filter(Filmography.filmography_id == filmography_id).first()
+async def delete_filmography(filmography_id: int, db: AsyncSession = Depends(get_db)):
+    db_filmography = await db.get(Filmography, filmography_id)
     if db_filmography is None:
         raise HTTPException(status_code=404, detail="Filmography not found")
 
-    db.delete(db_filmography)
-    db.commit()
+    await db.delete(db_filmography)
+    await db.commit()
+    row_counter.add("filmography", -1)
     return {"detail": "Filmography deleted successfully"}
 
-@app.get("/filmography_detailed/", response_model=List[FilmographyDetailed])
-def read_filmography_detailed(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    filmographies = (
-        db.query(
+def filmography_detailed_query():
+    return (
+        select(
             Filmography.filmography_id,
             Film.film_name,
             Actor.actor_name
         )
         .join(Film, Filmography.film_id == Film.film_id)
         .join(Actor, Filmography.actor_id == Actor.actor_id)
-        .order_by(Filmography.filmography_id)
-        .offset(skip)
-        .limit(limit)
-        .all()
     )
+
+@app.get("/filmography_detailed/", response_model=List[FilmographyDetailed])
+async def read_filmography_detailed(response: Response, skip: int = 0, limit: int = 100, after: Optional[str] = None, listing: ListQuery = Depends(), db: AsyncSession = Depends(get_db)):
+    query, order_by = listing.apply(filmography_detailed_query(), Filmography.filmography_id)
+    count_headers = await listing.total_count(db, query, Filmography)
+    filmographies = (await db.execute(paginate(query, order_by, skip, limit, after))).all()
+    set_next_cursor(response, filmographies, order_by, limit)
+    response.headers.update(count_headers)
     return filmographies
 
 
+# Page bundles: everything a frontend page needs for its first render in one
+# response. The parts are queried concurrently on separate connections, the
+# lookup tables come from the reference cache.
+async def page_json(query, order_by, schema, skip: int, limit: int, after: Optional[str], headers: dict) -> bytes:
+    rows = await fetch_rows(paginate(query, order_by, skip, limit, after))
+    cursor = next_cursor(rows, order_by, limit)
+    if cursor:
+        headers[NEXT_CURSOR_HEADER] = cursor
+    return dump_rows(schema, rows)
+
+# FilmList.js: films with their lookups for the add/edit form
+@app.get("/bundles/film_list")
+async def read_film_list_bundle(request: Request, skip: int = 0, limit: int = 100, after: Optional[str] = None):
+    headers = {}
+    return await bundle_response(request, {
+        "films": page_json(films_detailed_query(), [Film.film_id], FilmDetailedSchema, skip, limit, after, headers),
+        "studios": reference_json("studios", Studio, StudioSchema),
+        "genres": reference_json("genres", Genre, GenreSchema),
+        "producers": reference_json("producers", Producer, ProducerSchema),
+    }, headers)
+
+# FilmographyList.js: filmographies plus the films and actors to pick from
+FILM_CHOICE_SCHEMA = sparse_schema(FilmBasicSchema, ("film_id", "film_name"))
+
+
+@app.get("/bundles/filmography_list")
+async def read_filmography_list_bundle(request: Request, skip: int = 0, limit: int = 100, after: Optional[str] = None, films_limit: int = 1000):
+    headers = {}
+    return await bundle_response(request, {
+        "filmographies": page_json(filmography_detailed_query(), [Filmography.filmography_id], FilmographyDetailed, skip, limit, after, headers),
+        # The dropdown needs no annotation, so it is not even selected
+        "films": fetch_json(select(Film.film_id, Film.film_name).order_by(Film.film_id).limit(films_limit), FILM_CHOICE_SCHEMA),
+        "actors": reference_json("actors", Actor, ActorSchema),
+    }, headers)
+
+
+# Both rental reports read the open_rental summary kept by the journal handlers
+def rentals_query():
+    return select(
+        OpenRental.full_name,
+        OpenRental.client_phone_number,
+        OpenRental.film_name,
+        OpenRental.journal_date_issue,
+        OpenRental.journal_date_return,
+        OpenRental.rental_days.label("rental_duration")
+    )
+
+
 @app.get("/rentals", response_model=List[RentalInfo])
-def get_rentals(db: Session = Depends(get_db)):
-    query = (
+async def get_rentals(format: ExportFormat = ExportFormat.json, db: AsyncSession = Depends(get_db)):
+    query = rentals_query()
+    if format is not ExportFormat.json:
+        return stream_export(query, format, "rentals")
+    
+    return json_rows_response(await db.execute(query))
+
+
+def rental_debtors_query():
+    return (
         select(
-            func.concat(Client.client_last_name, ' ', Client.client_first_name).label("full_name"),
-            Client.client_phone_number,
-            Film.film_name,
-            Journal.journal_date_issue,
-            Journal.journal_date_return,
-            (Journal.journal_date_return - Journal.journal_date_issue).label("rental_duration")
+            OpenRental.full_name,
+            OpenRental.client_phone_number,
+            OpenRental.film_name,
+            OpenRental.journal_date_issue,
+            OpenRental.journal_date_return,
+            OpenRental.rental_days.label("rental_debt")
         )
-        .join(Client, Journal.client_id == Client.client_id)
-        .join(Film, Journal.film_id == Film.film_id)
-        .where(Journal.journal_refund.is_(False))
+        .where(OpenRental.rental_days > open_rentals.DEBT_DAYS)
     )
-    
-    results = db.execute(query).fetchall()
-    return [RentalInfo(**row._mapping) for row in results]
 
 
 @app.get("/rental_debtors", response_model=List[RentalDebt])
-def get_rentals(db: Session = Depends(get_db)):
+async def get_rental_debtors(format: ExportFormat = ExportFormat.json, db: AsyncSession = Depends(get_db)):
+    query = rental_debtors_query()
+    if format is not ExportFormat.json:
+        return stream_export(query, format, "rental_debtors")
+    
+    return json_rows_response(await db.execute(query))
+
+@app.get("/films/search", response_model=List[FilmSearchResult])
+async def search_films_by_text(q: str = Query(..., min_length=1, max_length=200), skip: int = 0, limit: int = 20, db: AsyncSession = Depends(get_db)):
+    # Ranked full-text search over film_name and film_annotation
+    return await search_films(db, q, skip, limit)
+
+@app.get("/films/by_producer/{producer_name}", response_model=List[FilmResponse])
+async def get_films_by_producer(producer_name: str, db: AsyncSession = Depends(get_db)):
+    # One query for the projected columns, no Film objects or relationship loads
     query = (
         select(
-            func.concat(Client.client_last_name, ' ', Client.client_first_name).label("full_name"),
-            Client.client_phone_number,
+            Producer.producer_name,
             Film.film_name,
-            Journal.journal_date_issue,
-            Journal.journal_date_return,
-            (Journal.journal_date_return - Journal.journal_date_issue).label("rental_debt")
-        )
-        .join(Client, Journal.client_id == Client.client_id)
-        .join(Film, Journal.film_id == Film.film_id)
-        .where(
-            Journal.journal_refund.is_(False),
-            (Journal.journal_date_return - Journal.journal_date_issue) > 10 
+            Studio.studio_name,
+            Film.film_date_release,
+            Film.film_rental
         )
+        .join(Film.producer)
+        .join(Film.studio)
+        .where(Producer.producer_name == producer_name)
     )
-    
-    results = db.execute(query).fetchall()
-    return [RentalDebt(**row._mapping) for row in results]
-
-@app.get("/films/by_producer/{producer_name}", response_model=List[FilmResponse])
-def get_films_by_producer(producer_name: str, db: Session = Depends(get_db)):
-    films = db.query(Film).join(Producer).join(Studio).filter(Producer.producer_name == producer_name).all()
+    result = await db.execute(query)
+    films = result.all()
     
     if not films:
         raise HTTPException(status_code=404, detail="Films not found for this producer")
 
-    return [
-    FilmResponse(
-        producer_name=film.producer.producer_name,
-        film_name=film.film_name,
-        studio_name=film.studio.studio_name,
-        film_date_release=film.film_date_release,  # Передаём объект date напрямую
-        film_rental=film.film_rental
-    )
-    for film in films
-]
+    return Response(encode_rows(result.keys(), films), media_type="application/json")
 
 @app.get("/films/grouped_by_genre", response_model=List[FilmGenreResponse])
-def get_films_grouped_by_genre(db: Session = Depends(get_db)):
+async def get_films_grouped_by_genre(db: AsyncSession = Depends(get_db)):
     query = (
         select(
             Genre.genre_name,
@@ -513,25 +788,7 @@ def get_films_grouped_by_genre(db: Session = Depends(get_db)):
         .order_by(Genre.genre_name)  # Сортировка по названию жанра
     )
     
-    results = db.execute(query).all()
-    
-    # Преобразуем результаты в список словарей
-    films_grouped_by_genre = [
-        FilmGenreResponse(
-            genre_name=result[0],
-            film_name=result[1],
-            producer_name=result[2],
-            studio_name=result[3],
-            film_date_release=result[4],
-            film_rental=result[5]
-        )
-        for result in results
-    ]
-    
-    return films_grouped_by_genre
-
-from passlib.context import CryptContext
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return json_rows_response(await db.execute(query))
 
 class Login(BaseModel):
     email: str
@@ -540,44 +797,97 @@ class Login(BaseModel):
 
 
 @app.post("/login")
-def login(login: Login):
-    db: Session = SessionLocal()
-    moderator = db.query(Moderator).filter(Moderator.moderator_email == login.email).first()
-    
-    if not moderator or not pwd_context.verify(login.password, moderator.hashed_password):
+async def login(login: Login, db: AsyncSession = Depends(get_db)):
+    moderator = await db.scalar(select(Moderator).where(Moderator.moderator_email == login.email))
+
+    # bcrypt runs in the password pool, never on the event loop
+    valid, new_hash = await passwords.verify_password(login.password, moderator.hashed_password if moderator else None)
+    if not valid:
         raise HTTPException(status_code=400, detail="Неверные учетные данные")
 
+    if new_hash is not None:
+        # The stored hash used outdated settings (e.g. fewer rounds), replace it transparently
+        moderator.hashed_password = new_hash
+        await db.commit()
+
     return {
         "moderator_id": moderator.moderator_id,
         "moderator_name": moderator.moderator_name,
         "moderator_email": moderator.moderator_email,
         "is_cashier": moderator.is_cashier,
         "is_admin": moderator.is_admin,
+        # Sent back as "Authorization: Bearer <access_token>"
+        **create_tokens(moderator),
     }
 
-# Настройки для хэширования паролей
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
-# Секретный ключ для JWT (должен быть защищен)
-SECRET_KEY = "your_secret_key_here" 
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
-
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+@app.post("/token/refresh")
+async def refresh_token(body: RefreshRequest, db: AsyncSession = Depends(get_db)):
+    claims = decode_token(body.refresh_token, REFRESH)
+    # The only lookup in the token flow: picks up role changes and deleted moderators
+    moderator = await db.get(Moderator, int(claims["sub"]))
+    if moderator is None:
+        raise HTTPException(status_code=401, detail="Недействительный токен", headers={"WWW-Authenticate": "Bearer"})
+    return create_tokens(moderator)
 
 @app.post("/register", response_model=ModeratorRead)
-def register_moderator(moderator: ModeratorCreate, db: Session = Depends(get_db)):
-    hashed_password = get_password_hash(moderator.password)
-    db_moderator = Moderator(
-        moderator_name=moderator.moderator_name,
-        moderator_email=moderator.moderator_email,
-        hashed_password=hashed_password,
-        is_user=moderator.is_user,
-        is_cashier=moderator.is_cashier,
-        is_admin=moderator.is_admin
+async def register_moderator(moderator: ModeratorCreate, claims: Optional[dict] = Depends(get_optional_claims), db: AsyncSession = Depends(get_db)):
+    # Self-registration creates a plain user; only an admin hands out roles.
+    # The first admin is promoted in the database by hand.
+    grants_roles = claims is not None and claims.get("is_admin")
+    hashed_password = await passwords.hash_password(moderator.password)
+    db_moderator = await db.scalar(
+        insert(Moderator).values(
+            moderator_name=moderator.moderator_name,
+            moderator_email=moderator.moderator_email,
+            hashed_password=hashed_password,
+            is_user=moderator.is_user if grants_roles else True,
+            is_cashier=moderator.is_cashier if grants_roles else False,
+            is_admin=moderator.is_admin if grants_roles else False
+        ).returning(Moderator)
     )
-    db.add(db_moderator)
-    db.commit()
-    db.refresh(db_moderator)
-    return db_moderator
\ No newline at end of file
+    await db.commit()
+    return db_moderator
+
+
+# Latency of the password pool: queueing vs hashing, rejected logins, upgraded hashes
+@app.get("/admin/auth", dependencies=[Depends(require_admin)])
+async def read_auth_status():
+    return {**passwords.stats.snapshot(), "token_cache": claims_cache.snapshot()}
+
+
+# Per-route latency, SQL and response size of this worker, for Prometheus to scrape
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+# Connection pool statistics, used to size max_connections against the worker count
+@app.get("/admin/pool", dependencies=[Depends(require_admin)])
+async def read_pool_status():
+    return {
+        "api": pool_status(async_engine.sync_engine),
+        "sync": pool_status(engine),
+    }
+
+
+# Statements slower than SLOW_QUERY_MS, newest first, some with their EXPLAIN ANALYZE plan
+@app.get("/admin/slow_queries", dependencies=[Depends(require_admin)])
+async def read_slow_queries():
+    return slow_query_log.snapshot()
+
+
+@app.delete("/admin/slow_queries", dependencies=[Depends(require_admin)])
+async def clear_slow_queries():
+    slow_query_log.clear()
+    return {"detail": "Slow query log cleared"}
+
+
+# Rebuilds the open_rental summary, e.g. after journal rows were changed by hand
+@app.post("/admin/open_rentals/rebuild", dependencies=[Depends(require_admin)])
+async def rebuild_open_rentals(db: AsyncSession = Depends(get_db)):
+    rows = await open_rentals.rebuild(db)
+    await db.commit()
+    return {"open_rentals": rows}
@@ -0,0 +1,181 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Tuple
+
+from sqlalchemy import event
+
+# Upper bounds of the latency histogram, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_current = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    """What one request spent in the database; filled in by the cursor hooks."""
+
+    __slots__ = ("scope", "statements", "db_seconds")
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.statements = 0
+        self.db_seconds = 0.0
+
+
+class RouteStats:
+    __slots__ = ("buckets", "requests", "seconds", "statements", "db_seconds", "response_bytes", "statuses")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.requests = 0
+        self.seconds = 0.0
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.response_bytes = 0
+        self.statuses: Dict[str, int] = {}
+
+
+class MetricsRegistry:
+    """Per-route totals of this worker process, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[Tuple[str, str], RouteStats] = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float, request: RequestMetrics, response_bytes: int) -> None:
+        with self._lock:
+            stats = self._routes.get((method, route))
+            if stats is None:
+                stats = self._routes[(method, route)] = RouteStats()
+            stats.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            stats.requests += 1
+            stats.seconds += seconds
+            stats.statements += request.statements
+            stats.db_seconds += request.db_seconds
+            stats.response_bytes += response_bytes
+            stats.statuses[str(status)] = stats.statuses.get(str(status), 0) + 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._routes.clear()
+
+    def render(self) -> str:
+        with self._lock:
+            routes = sorted(self._routes.items())
+            lines = [
+                "# HELP http_requests_total Requests handled, by route and status.",
+                "# TYPE http_requests_total counter",
+            ]
+            for (method, route), stats in routes:
+                for status, count in sorted(stats.statuses.items()):
+                    lines.append(f'http_requests_total{{{_labels(method, route)},status="{status}"}} {count}')
+
+            lines += [
+                "# HELP http_request_duration_seconds Time from the request to the last byte of the response.",
+                "# TYPE http_request_duration_seconds histogram",
+            ]
+            for (method, route), stats in routes:
+                labels = _labels(method, route)
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), stats.buckets):
+                    cumulative += count
+                    lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"http_request_duration_seconds_sum{{{labels}}} {stats.seconds:.6f}")
+                lines.append(f"http_request_duration_seconds_count{{{labels}}} {stats.requests}")
+
+            for name, kind, help_text, value in (
+                ("http_request_sql_statements_total", "counter", "SQL statements issued while handling the route.",
+                 lambda stats: stats.statements),
+                ("http_request_db_seconds_total", "counter", "Time spent executing SQL while handling the route.",
+                 lambda stats: f"{stats.db_seconds:.6f}"),
+                ("http_response_bytes_total", "counter", "Response body bytes sent by the route.",
+                 lambda stats: stats.response_bytes),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                for (method, route), stats in routes:
+                    lines.append(f"{name}{{{_labels(method, route)}}} {value(stats)}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(method: str, route: str) -> str:
+    route = route.replace("\\", "\\\\").replace('"', '\\"')
+    return f'method="{method}",route="{route}"'
+
+
+registry = MetricsRegistry()
+
+
+# The start time lives on the statement's execution context, which a failed
+# statement simply drops; a per-connection stack would keep its entry.
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        context.metrics_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    request = _current.get()
+    if request is None:
+        return
+    start = getattr(context, "metrics_query_start", None)
+    if start is None:
+        return
+    request.statements += 1
+    request.db_seconds += time.perf_counter() - start
+
+
+def current_route():
+    """Method and route template of the request being handled, None outside requests."""
+    request = _current.get()
+    if request is None:
+        return None
+    route = request.scope.get("route")
+    return f"{request.scope['method']} {getattr(route, 'path', request.scope['path'])}"
+
+
+def track_queries(engine) -> None:
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class MetricsMiddleware:
+    """Records latency, SQL statements, DB time and response size per route template."""
+
+    def __init__(self, app, registry: MetricsRegistry = registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = RequestMetrics(scope)
+        response = {"status": 500, "bytes": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        token = _current.set(request)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            # The router stores the matched route in the scope; unmatched paths share
+            # one label so random URLs cannot blow up the number of series
+            route = scope.get("route")
+            self.registry.observe(
+                scope["method"],
+                getattr(route, "path", "<unmatched>"),
+                response["status"],
+                time.perf_counter() - start,
+                request,
+                response["bytes"],
+            )
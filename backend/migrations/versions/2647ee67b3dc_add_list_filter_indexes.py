@@ -0,0 +1,39 @@
+"""Add list filter indexes
+
+Revision ID: 2647ee67b3dc
+Revises: 3dd53d05133e
+Create Date: 2026-10-18 16:05:12.482913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2647ee67b3dc'
+down_revision: Union[str, None] = '3dd53d05133e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        # journal_date_issue:range:... filters and sorts of the journal lists
+        op.create_index('ix_journal_journal_date_issue', 'journal', ['journal_date_issue'], unique=False, postgresql_concurrently=True)
+        # film_name:prefix:... compiles to LIKE 'x%', which a btree only serves with the pattern opclass
+        op.create_index(
+            'ix_film_name_pattern',
+            'film',
+            ['film_name'],
+            unique=False,
+            postgresql_ops={'film_name': 'varchar_pattern_ops'},
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_film_name_pattern', table_name='film', postgresql_concurrently=True)
+        op.drop_index('ix_journal_journal_date_issue', table_name='journal', postgresql_concurrently=True)
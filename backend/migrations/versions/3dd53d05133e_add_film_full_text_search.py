@@ -0,0 +1,34 @@
+"""Add film full text search
+
+Revision ID: 3dd53d05133e
+Revises: 4d6ff0571f8e
+Create Date: 2026-10-18 12:27:15.660419
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3dd53d05133e'
+down_revision: Union[str, None] = '4d6ff0571f8e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keep in sync with search.POSTGRES_DDL
+    op.execute("""
+        ALTER TABLE film ADD COLUMN film_search tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('russian', coalesce(film_name, '')), 'A') ||
+            setweight(to_tsvector('russian', film_annotation), 'B')
+        ) STORED
+    """)
+    op.create_index('ix_film_search', 'film', ['film_search'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_film_search', table_name='film', postgresql_using='gin')
+    op.drop_column('film', 'film_search')
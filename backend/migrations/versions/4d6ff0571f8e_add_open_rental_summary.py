@@ -0,0 +1,58 @@
+"""Add open rental summary
+
+Revision ID: 4d6ff0571f8e
+Revises: 693f165a6557
+Create Date: 2026-10-18 11:03:52.904117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4d6ff0571f8e'
+down_revision: Union[str, None] = '693f165a6557'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('open_rental',
+    sa.Column('journal_id', sa.Integer(), nullable=False),
+    sa.Column('client_id', sa.Integer(), nullable=False),
+    sa.Column('film_id', sa.Integer(), nullable=False),
+    sa.Column('full_name', sa.String(length=51), nullable=False),
+    sa.Column('client_phone_number', sa.String(length=20), nullable=False),
+    sa.Column('film_name', sa.String(length=255), nullable=True),
+    sa.Column('journal_date_issue', sa.Date(), nullable=False),
+    sa.Column('journal_date_return', sa.Date(), nullable=False),
+    sa.Column('rental_days', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['journal_id'], ['journal.journal_id'], ondelete='CASCADE', onupdate='CASCADE'),
+    sa.PrimaryKeyConstraint('journal_id')
+    )
+    op.create_index(op.f('ix_open_rental_client_id'), 'open_rental', ['client_id'], unique=False)
+    op.create_index(op.f('ix_open_rental_film_id'), 'open_rental', ['film_id'], unique=False)
+    op.create_index(op.f('ix_open_rental_rental_days'), 'open_rental', ['rental_days'], unique=False)
+
+    # Backfill from the journal, later changes are applied by the API handlers
+    op.execute("""
+        INSERT INTO open_rental (journal_id, client_id, film_id, full_name, client_phone_number,
+                                 film_name, journal_date_issue, journal_date_return, rental_days)
+        SELECT j.journal_id, j.client_id, j.film_id,
+               c.client_last_name || ' ' || c.client_first_name, c.client_phone_number,
+               f.film_name, j.journal_date_issue, j.journal_date_return,
+               j.journal_date_return - j.journal_date_issue
+        FROM journal j
+        JOIN client c ON c.client_id = j.client_id
+        JOIN film f ON f.film_id = j.film_id
+        WHERE j.journal_refund IS false
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_open_rental_rental_days'), table_name='open_rental')
+    op.drop_index(op.f('ix_open_rental_film_id'), table_name='open_rental')
+    op.drop_index(op.f('ix_open_rental_client_id'), table_name='open_rental')
+    op.drop_table('open_rental')
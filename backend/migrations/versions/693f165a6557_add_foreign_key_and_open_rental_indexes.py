@@ -0,0 +1,51 @@
+"""Add foreign key and open rental indexes
+
+Revision ID: 693f165a6557
+Revises: c0511b416c54
+Create Date: 2026-10-18 09:12:40.318274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '693f165a6557'
+down_revision: Union[str, None] = 'c0511b416c54'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# journal.film_id is already covered by the leading column of uq_journal_film_client
+FOREIGN_KEY_INDEXES = [
+    ('ix_film_studio_id', 'film', 'studio_id'),
+    ('ix_film_genre_id', 'film', 'genre_id'),
+    ('ix_film_producer_id', 'film', 'producer_id'),
+    ('ix_filmography_film_id', 'filmography', 'film_id'),
+    ('ix_filmography_actor_id', 'filmography', 'actor_id'),
+    ('ix_journal_client_id', 'journal', 'client_id'),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps the tables writable while the indexes build,
+    # but it can't run inside the migration transaction.
+    with op.get_context().autocommit_block():
+        for name, table, column in FOREIGN_KEY_INDEXES:
+            op.create_index(name, table, [column], unique=False, postgresql_concurrently=True)
+        op.create_index(
+            'ix_journal_open',
+            'journal',
+            ['client_id', 'film_id', 'journal_date_issue', 'journal_date_return'],
+            unique=False,
+            postgresql_where=sa.text('journal_refund IS false'),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_journal_open', table_name='journal', postgresql_concurrently=True)
+        for name, table, _ in reversed(FOREIGN_KEY_INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
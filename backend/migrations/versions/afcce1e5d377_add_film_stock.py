@@ -0,0 +1,43 @@
+"""Add film stock
+
+Revision ID: afcce1e5d377
+Revises: 2647ee67b3dc
+Create Date: 2026-10-18 17:42:09.215734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'afcce1e5d377'
+down_revision: Union[str, None] = '2647ee67b3dc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('film_stock',
+    sa.Column('film_id', sa.Integer(), nullable=False),
+    sa.Column('copies', sa.Integer(), nullable=False),
+    sa.Column('available', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['film_id'], ['film.film_id'], ondelete='CASCADE', onupdate='CASCADE'),
+    sa.PrimaryKeyConstraint('film_id')
+    )
+    op.create_index('ix_film_stock_available', 'film_stock', ['film_id'], unique=False, postgresql_where=sa.text('available > 0'))
+
+    # One copy on the shelf per film (FILM_DEFAULT_COPIES) besides the ones out on open rentals
+    op.execute("""
+        INSERT INTO film_stock (film_id, copies, available)
+        SELECT f.film_id, count(r.journal_id) + 1, 1
+        FROM film f
+        LEFT JOIN open_rental r ON r.film_id = f.film_id
+        GROUP BY f.film_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_film_stock_available', table_name='film_stock', postgresql_where=sa.text('available > 0'))
+    op.drop_table('film_stock')
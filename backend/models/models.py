@@ -1,11 +1,14 @@
-from typing import Optional
-from sqlalchemy import Column, Integer, MetaData, String, Date, Boolean, ForeignKey, Text, DECIMAL, TIMESTAMP, UniqueConstraint
+from sqlalchemy import Column, Integer, MetaData, String, Date, Boolean, ForeignKey, Index, Text, DECIMAL, TIMESTAMP, UniqueConstraint
 from sqlalchemy.orm import relationship, declarative_base
 from datetime import datetime
 
 metadata = MetaData()
 Base = declarative_base(metadata=metadata)
 
+# Relationships never load implicitly (lazy="raise"): queries select the columns
+# they need or ask for joinedload/selectinload. Collections rely on the
+# ON DELETE CASCADE foreign keys instead of being loaded on delete.
+
 class Moderator(Base):
     __tablename__ = 'moderator'
 
@@ -25,7 +28,7 @@ class Studio(Base):
     studio_name = Column(String(50), nullable=False)
     studio_country = Column(String(50), nullable=False)
 
-    films = relationship("Film", back_populates="studio")
+    films = relationship("Film", back_populates="studio", lazy="raise", passive_deletes=True)
 
 class Genre(Base):
     __tablename__ = 'genre'
@@ -33,7 +36,7 @@ class Genre(Base):
     genre_id = Column(Integer, primary_key=True, autoincrement=True)
     genre_name = Column(String(30), nullable=False)
 
-    films = relationship("Film", back_populates="genre")
+    films = relationship("Film", back_populates="genre", lazy="raise", passive_deletes=True)
 
 class Producer(Base):
     __tablename__ = 'producer'
@@ -41,7 +44,7 @@ class Producer(Base):
     producer_id = Column(Integer, primary_key=True, autoincrement=True)
     producer_name = Column(String(50), nullable=False)
 
-    films = relationship("Film", back_populates="producer")
+    films = relationship("Film", back_populates="producer", lazy="raise", passive_deletes=True)
 
 class Actor(Base):
     __tablename__ = 'actor'
@@ -49,7 +52,7 @@ class Actor(Base):
     actor_id = Column(Integer, primary_key=True, autoincrement=True)
     actor_name = Column(String(50), nullable=False)
 
-    filmographies = relationship("Filmography", back_populates="actor")
+    filmographies = relationship("Filmography", back_populates="actor", lazy="raise", passive_deletes=True)
 
 class Client(Base):
     __tablename__ = 'client'
@@ -62,49 +65,103 @@ class Client(Base):
     client_phone_number = Column(String(20), nullable=False)
     created_at = Column(TIMESTAMP, default=datetime.utcnow)
 
-    journals = relationship("Journal", back_populates="client")
+    journals = relationship("Journal", back_populates="client", lazy="raise", passive_deletes=True)
 
 class Film(Base):
     __tablename__ = 'film'
 
     film_id = Column(Integer, primary_key=True, autoincrement=True)
-    studio_id = Column(Integer, ForeignKey('studio.studio_id', ondelete="CASCADE", onupdate="CASCADE"), nullable=False)
-    genre_id = Column(Integer, ForeignKey('genre.genre_id', ondelete="CASCADE", onupdate="CASCADE"), nullable=False)
-    producer_id = Column(Integer, ForeignKey('producer.producer_id', ondelete="CASCADE", onupdate="CASCADE"), nullable=False)
+    studio_id = Column(Integer, ForeignKey('studio.studio_id', ondelete="CASCADE", onupdate="CASCADE"), nullable=False, index=True)
+    genre_id = Column(Integer, ForeignKey('genre.genre_id', ondelete="CASCADE", onupdate="CASCADE"), nullable=False, index=True)
+    producer_id = Column(Integer, ForeignKey('producer.producer_id', ondelete="CASCADE", onupdate="CASCADE"), nullable=False, index=True)
     film_name = Column(String(255))
     film_date_release = Column(Date)
     film_rental = Column(DECIMAL(10, 2), nullable=False)
     film_annotation = Column(Text, nullable=False)
 
-    studio = relationship("Studio", back_populates="films")
-    genre = relationship("Genre", back_populates="films")
-    producer = relationship("Producer", back_populates="films")
-    filmographies = relationship("Filmography", back_populates="film")
-    journals = relationship("Journal", back_populates="film")
+    studio = relationship("Studio", back_populates="films", lazy="raise")
+    genre = relationship("Genre", back_populates="films", lazy="raise")
+    producer = relationship("Producer", back_populates="films", lazy="raise")
+    filmographies = relationship("Filmography", back_populates="film", lazy="raise", passive_deletes=True)
+    journals = relationship("Journal", back_populates="film", lazy="raise", passive_deletes=True)
+
+    __table_args__ = (
+        # film_name:prefix:... list filters (LIKE 'x%') need the pattern opclass on Postgres
+        Index('ix_film_name_pattern', 'film_name', postgresql_ops={'film_name': 'varchar_pattern_ops'}),
+    )
 
 class Filmography(Base):
     __tablename__ = 'filmography'
 
     filmography_id = Column(Integer, primary_key=True, autoincrement=True)
-    film_id = Column(Integer, ForeignKey('film.film_id', ondelete="CASCADE", onupdate="CASCADE"), nullable=False)
-    actor_id = Column(Integer, ForeignKey('actor.actor_id', ondelete="CASCADE", onupdate="CASCADE"), nullable=False)
+    film_id = Column(Integer, ForeignKey('film.film_id', ondelete="CASCADE", onupdate="CASCADE"), nullable=False, index=True)
+    actor_id = Column(Integer, ForeignKey('actor.actor_id', ondelete="CASCADE", onupdate="CASCADE"), nullable=False, index=True)
 
-    film = relationship("Film", back_populates="filmographies")
-    actor = relationship("Actor", back_populates="filmographies")
+    film = relationship("Film", back_populates="filmographies", lazy="raise")
+    actor = relationship("Actor", back_populates="filmographies", lazy="raise")
 
 class Journal(Base):
     __tablename__ = 'journal'
 
     journal_id = Column(Integer, primary_key=True, autoincrement=True)
     film_id = Column(Integer, ForeignKey('film.film_id', ondelete="CASCADE", onupdate="CASCADE"), nullable=False)
-    client_id = Column(Integer, ForeignKey('client.client_id', ondelete="CASCADE", onupdate="CASCADE"), nullable=False)
-    journal_date_issue = Column(Date, nullable=False)
+    client_id = Column(Integer, ForeignKey('client.client_id', ondelete="CASCADE", onupdate="CASCADE"), nullable=False, index=True)
+    journal_date_issue = Column(Date, nullable=False, index=True)
     journal_date_return = Column(Date, nullable=False)
     journal_refund = Column(Boolean)
 
-    film = relationship("Film", back_populates="journals")
-    client = relationship("Client", back_populates="journals")
+    film = relationship("Film", back_populates="journals", lazy="raise")
+    client = relationship("Client", back_populates="journals", lazy="raise")
 
     __table_args__ = (
+        # film_id lookups are served by the leading column of this constraint
         UniqueConstraint('film_id', 'client_id', name='uq_journal_film_client'),
+        # Open rentals only, matches the `journal_refund IS false` filter of the reports
+        Index(
+            'ix_journal_open',
+            'client_id', 'film_id', 'journal_date_issue', 'journal_date_return',
+            postgresql_where=journal_refund.is_(False),
+            sqlite_where=journal_refund.is_(False),
+        ),
     )
+
+class FilmStock(Base):
+    """Copies of a film and how many of them are on the shelf.
+
+    ``available`` is re-derived from open_rental whenever it changes (see
+    stock.recount); checkout takes a copy with a conditional UPDATE of this row.
+    """
+    __tablename__ = 'film_stock'
+
+    film_id = Column(Integer, ForeignKey('film.film_id', ondelete="CASCADE", onupdate="CASCADE"), primary_key=True)
+    copies = Column(Integer, nullable=False)
+    # Below zero when more rentals are open than there are copies (imported history)
+    available = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        # "Which films can be rented": only the films with a copy on the shelf
+        Index(
+            'ix_film_stock_available',
+            'film_id',
+            postgresql_where=available > 0,
+            sqlite_where=available > 0,
+        ),
+    )
+
+class OpenRental(Base):
+    """Open (not refunded) journal entries with the report columns denormalized.
+
+    Kept current by the journal, client and film write paths, so the rental
+    reports read it without joining or scanning the journal.
+    """
+    __tablename__ = 'open_rental'
+
+    journal_id = Column(Integer, ForeignKey('journal.journal_id', ondelete="CASCADE", onupdate="CASCADE"), primary_key=True)
+    client_id = Column(Integer, nullable=False, index=True)
+    film_id = Column(Integer, nullable=False, index=True)
+    full_name = Column(String(51), nullable=False)
+    client_phone_number = Column(String(20), nullable=False)
+    film_name = Column(String(255))
+    journal_date_issue = Column(Date, nullable=False)
+    journal_date_return = Column(Date, nullable=False)
+    rental_days = Column(Integer, nullable=False, index=True)
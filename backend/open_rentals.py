@@ -0,0 +1,95 @@
+from sqlalchemy import delete, exists, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import stock
+from expressions import days_between
+from models.models import Client, Film, Journal, OpenRental
+
+# A rental longer than this many days is reported as a debt
+DEBT_DAYS = 10
+
+
+def _open_rentals_query():
+    return (
+        select(
+            Journal.journal_id,
+            Journal.client_id,
+            Journal.film_id,
+            (Client.client_last_name + ' ' + Client.client_first_name).label("full_name"),
+            Client.client_phone_number,
+            Film.film_name,
+            Journal.journal_date_issue,
+            Journal.journal_date_return,
+            days_between(Journal.journal_date_return, Journal.journal_date_issue).label("rental_days"),
+        )
+        .join(Client, Journal.client_id == Client.client_id)
+        .join(Film, Journal.film_id == Film.film_id)
+        .where(Journal.journal_refund.is_(False))
+    )
+
+
+def _insert_open_rentals(query):
+    return insert(OpenRental).from_select([column.key for column in query.selected_columns], query)
+
+
+async def _replace(db: AsyncSession, condition, query) -> None:
+    # The films whose rentals were dropped or added get their stock recounted
+    removed = await db.scalars(delete(OpenRental).where(condition).returning(OpenRental.film_id))
+    film_ids = set(removed.all())
+    film_ids.update((await db.scalars(_insert_open_rentals(query).returning(OpenRental.film_id))).all())
+    await stock.recount(db, film_ids)
+
+
+async def sync_journal(db: AsyncSession, journal_id: int) -> None:
+    """Re-derive one journal's row; call after the journal change is flushed."""
+    await _replace(db, OpenRental.journal_id == journal_id, _open_rentals_query().where(Journal.journal_id == journal_id))
+
+
+async def drop_journals(db: AsyncSession, journal_ids: list) -> None:
+    """Remove the rows of journals about to be deleted. The foreign key would drop
+    them as well, but then the films they held would not get their copies back."""
+    removed = await db.scalars(delete(OpenRental).where(OpenRental.journal_id.in_(journal_ids)).returning(OpenRental.film_id))
+    await stock.recount(db, removed.all())
+
+
+async def resync(db: AsyncSession, key: str, ids: list) -> None:
+    """Re-derive the rows of many journals, clients or films (key is journal_id, client_id or film_id)."""
+    if not ids:
+        return
+    await _replace(db, getattr(OpenRental, key).in_(ids), _open_rentals_query().where(getattr(Journal, key).in_(ids)))
+
+
+async def sync_client(db: AsyncSession, client: Client) -> None:
+    await db.execute(
+        update(OpenRental)
+        .where(OpenRental.client_id == client.client_id)
+        .values(
+            full_name=client.client_last_name + ' ' + client.client_first_name,
+            client_phone_number=client.client_phone_number,
+        )
+    )
+
+
+async def sync_film(db: AsyncSession, film: Film) -> None:
+    await db.execute(
+        update(OpenRental)
+        .where(OpenRental.film_id == film.film_id)
+        .values(film_name=film.film_name)
+    )
+
+
+async def sync_missing(db: AsyncSession) -> None:
+    """Add rows for open journal entries written outside the handlers (bulk import)."""
+    query = _open_rentals_query().where(
+        ~exists().where(OpenRental.journal_id == Journal.journal_id)
+    )
+    added = await db.scalars(_insert_open_rentals(query).returning(OpenRental.film_id))
+    await stock.recount(db, added.all())
+
+
+async def rebuild(db: AsyncSession) -> int:
+    await db.execute(delete(OpenRental))
+    await db.execute(_insert_open_rentals(_open_rentals_query()))
+    await stock.add_missing(db)
+    await stock.recount(db)
+    return await db.scalar(select(func.count()).select_from(OpenRental))
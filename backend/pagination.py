@@ -0,0 +1,142 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response
+from sqlalchemy import Boolean, Date, DateTime, Integer, Numeric, String, and_, literal, or_, tuple_
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import UnaryExpression
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+_SORT_MODIFIERS = (operators.asc_op, operators.desc_op, operators.nulls_last_op, operators.nulls_first_op)
+
+
+def _cursor_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _invalid_cursor() -> HTTPException:
+    return HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def encode_cursor(values: Sequence) -> str:
+    raw = json.dumps(list(values), separators=(",", ":"), default=_cursor_default).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str, size: int) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except ValueError:
+        raise _invalid_cursor()
+    if not isinstance(values, list) or len(values) != size:
+        raise _invalid_cursor()
+    return values
+
+
+def sort_key(item) -> Tuple[object, bool]:
+    """The column of an order_by item and whether it sorts descending."""
+    descending = False
+    while isinstance(item, UnaryExpression) and item.modifier in _SORT_MODIFIERS:
+        descending = descending or item.modifier is operators.desc_op
+        item = item.element
+    return item, descending
+
+
+def _cursor_value(column, value):
+    # JSON has no dates or decimals, the cursor carries them as strings. Every
+    # value is checked against the column's type: the driver would reject a
+    # mismatch (asyncpg: 'x' for an integer) with a 500 instead of a 400.
+    kind = column.type
+    if value is None:
+        if _nullable(column):
+            return None
+        raise _invalid_cursor()
+    try:
+        if isinstance(kind, (DateTime, Date)):
+            if not isinstance(value, str):
+                raise ValueError(value)
+            return datetime.fromisoformat(value) if isinstance(kind, DateTime) else date.fromisoformat(value)
+        if isinstance(kind, Numeric):
+            if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+                raise ValueError(value)
+            number = Decimal(str(value))
+            if not number.is_finite():
+                raise ValueError(value)
+            return number
+        if isinstance(kind, Boolean):
+            valid = isinstance(value, bool)
+        elif isinstance(kind, Integer):
+            valid = isinstance(value, int) and not isinstance(value, bool)
+        elif isinstance(kind, String):
+            valid = isinstance(value, str)
+        else:
+            # Expressions without a known type (e.g. day differences) keep JSON's scalars
+            valid = isinstance(value, (str, int, float))
+    except (ArithmeticError, ValueError):
+        raise _invalid_cursor()
+    if not valid:
+        raise _invalid_cursor()
+    return value
+
+
+def _nullable(column) -> bool:
+    return getattr(column, "nullable", False) and not getattr(column, "primary_key", False)
+
+
+def _after(keys: Sequence, values: Sequence):
+    if not any(descending or _nullable(column) for column, descending in keys):
+        # One row comparison, which Postgres runs as an index range scan
+        return tuple_(*(column for column, _ in keys)) > tuple_(*values)
+    # Mixed directions: (a > x) OR (a = x AND b < y) OR ...; nullable keys sort
+    # NULLS LAST, so NULL follows every value and nothing follows NULL
+    clauses = []
+    equal = []
+    for (column, descending), value in zip(keys, values):
+        if value is None:
+            equal.append(column.is_(None))
+            continue
+        # literal(): comparisons with a bare True/False are refused by SQLAlchemy
+        value = literal(value, column.type)
+        step = column < value if descending else column > value
+        if _nullable(column):
+            step = or_(step, column.is_(None))
+        clauses.append(and_(*equal, step))
+        equal.append(column == value)
+    return or_(*clauses)
+
+
+def paginate(query, order_by: Sequence, skip: int, limit: int, after: Optional[str]):
+    # Keyset mode seeks straight to the position after the cursor instead of
+    # scanning and discarding `skip` rows; skip/limit is kept for old clients.
+    # order_by may mix column.desc() items; it must end in a unique column.
+    query = query.order_by(*order_by)
+    if after is not None:
+        keys = [sort_key(item) for item in order_by]
+        values = decode_cursor(after, len(order_by))
+        query = query.where(_after(keys, [_cursor_value(column, value) for (column, _), value in zip(keys, values)]))
+    else:
+        query = query.offset(skip)
+    return query.limit(limit)
+
+
+def next_cursor(rows: Sequence, order_by: Sequence, limit: int) -> Optional[str]:
+    # A short page means the end of the list, so no cursor is sent.
+    if rows and len(rows) == limit:
+        last = rows[-1]
+        return encode_cursor([getattr(last, sort_key(item)[0].key) for item in order_by])
+    return None
+
+
+def set_next_cursor(response: Response, rows: Sequence, order_by: Sequence, limit: int) -> None:
+    cursor = next_cursor(rows, order_by, limit)
+    if cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
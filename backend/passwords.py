@@ -0,0 +1,138 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+
+from config import BCRYPT_ROUNDS, PASSWORD_HASH_EXECUTOR, PASSWORD_HASH_QUEUE, PASSWORD_HASH_WORKERS
+
+
+# Настройки для хэширования паролей. passlib and bcrypt are imported on the first
+# login rather than when a worker starts, once per process of the pool.
+@lru_cache(maxsize=None)
+def _context():
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+# Run inside the pool workers, so they stay module level functions (picklable for
+# the process pool) and report their own run time to separate it from queueing.
+def _hash(password: str) -> Tuple[str, float]:
+    start = time.perf_counter()
+    return _context().hash(password), time.perf_counter() - start
+
+
+def _verify(password: str, hashed_password: Optional[str]) -> Tuple[Tuple[bool, Optional[str]], float]:
+    start = time.perf_counter()
+    if hashed_password is None:
+        # Unknown e-mail: spend the same time as a real check so it can't be probed
+        _context().dummy_verify()
+        result = (False, None)
+    else:
+        # verify_and_update re-hashes when needs_update() says the hash is outdated
+        result = _context().verify_and_update(password, hashed_password)
+    return result, time.perf_counter() - start
+
+
+class PasswordHashStats:
+    """Latency of hash/verify jobs, split into time queued for a worker and time hashing."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.operations = {}
+
+    def record(self, operation: str, total: float, run: float) -> None:
+        with self._lock:
+            stats = self.operations.setdefault(
+                operation, {"count": 0, "total": 0.0, "max": 0.0, "queued": 0.0, "max_queued": 0.0}
+            )
+            stats["count"] += 1
+            stats["total"] += total
+            stats["max"] = max(stats["max"], total)
+            stats["queued"] += total - run
+            stats["max_queued"] = max(stats["max_queued"], total - run)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            snapshot = {
+                "executor": PASSWORD_HASH_EXECUTOR,
+                "workers": PASSWORD_HASH_WORKERS,
+                "queue_limit": PASSWORD_HASH_QUEUE,
+                "in_flight": self.in_flight,
+                "rejected": self.rejected,
+                "rehashed": self.rehashed,
+            }
+            for operation, stats in self.operations.items():
+                count = stats["count"]
+                snapshot[operation] = {
+                    "count": count,
+                    "avg_ms": round(stats["total"] / count * 1000, 3),
+                    "max_ms": round(stats["max"] * 1000, 3),
+                    "avg_queued_ms": round(stats["queued"] / count * 1000, 3),
+                    "max_queued_ms": round(stats["max_queued"] * 1000, 3),
+                }
+            return snapshot
+
+
+stats = PasswordHashStats()
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> Executor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if PASSWORD_HASH_EXECUTOR == "process":
+                _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+            else:
+                # bcrypt releases the GIL while hashing, so threads already run in parallel
+                _executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+        return _executor
+
+
+def shutdown() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+async def _submit(operation: str, function, *args):
+    # Running jobs plus those waiting for a worker; beyond that answer 503 right away
+    # instead of letting a login burst pile up requests and their DB sessions.
+    with stats._lock:
+        if stats.in_flight >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE:
+            stats.rejected += 1
+            raise HTTPException(status_code=503, detail="Сервер перегружен, повторите вход позже", headers={"Retry-After": "1"})
+        stats.in_flight += 1
+    start = time.perf_counter()
+    try:
+        result, run = await asyncio.get_running_loop().run_in_executor(_get_executor(), function, *args)
+    finally:
+        with stats._lock:
+            stats.in_flight -= 1
+    stats.record(operation, time.perf_counter() - start, run)
+    return result
+
+
+async def hash_password(password: str) -> str:
+    return await _submit("hash", _hash, password)
+
+
+async def verify_password(password: str, hashed_password: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """(valid, new_hash): new_hash is set when the stored hash should be replaced."""
+    valid, new_hash = await _submit("verify", _verify, password, hashed_password)
+    if new_hash is not None:
+        with stats._lock:
+            stats.rehashed += 1
+    return valid, new_hash
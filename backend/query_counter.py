@@ -0,0 +1,58 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+_current = ContextVar("statement_counter", default=None)
+
+
+class TooManyStatementsError(RuntimeError):
+    pass
+
+
+class StatementCounter:
+    def __init__(self, limit: Optional[int] = None):
+        self.limit = limit
+        self.count = 0
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    counter = _current.get()
+    if counter is None:
+        return
+    counter.count += 1
+    if counter.limit is not None and counter.count > counter.limit:
+        raise TooManyStatementsError(
+            f"{counter.count} SQL statements issued, limit is {counter.limit}: {statement}"
+        )
+
+
+def track_statements(engine) -> None:
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+
+
+@contextmanager
+def count_statements(limit: Optional[int] = None):
+    """Count statements run in this context; raise once more than ``limit`` run."""
+    counter = StatementCounter(limit)
+    token = _current.set(counter)
+    try:
+        yield counter
+    finally:
+        _current.reset(token)
+
+
+class StatementLimitMiddleware:
+    """Fails any request that issues more than ``limit`` SQL statements (N+1 guard)."""
+
+    def __init__(self, app, limit: int):
+        self.app = app
+        self.limit = limit
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with count_statements(self.limit):
+            await self.app(scope, receive, send)
@@ -0,0 +1,86 @@
+import hashlib
+import time
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+from config import REFERENCE_CACHE_TTL
+
+MAX_ENTRIES_PER_NAME = 256
+
+
+def make_etag(body: bytes) -> str:
+    return '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in tags or etag in tags
+
+
+def conditional_response(request: Request, body: bytes, headers: Optional[Dict[str, str]] = None) -> Response:
+    """JSON response with a strong ETag, or an empty 304 when the client already has it."""
+    etag = make_etag(body)
+    headers = {**(headers or {}), "ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+class CacheEntry:
+    def __init__(self, version: int, body: bytes, headers: Dict[str, str]):
+        self.version = version
+        self.body = body
+        self.headers = headers
+        self.created = time.monotonic()
+
+
+class ReferenceCache:
+    """Serialized list pages of rarely changing tables, per worker process.
+
+    Writes in this worker bump the table's version, which drops its pages.
+    Changes made by other workers become visible once the TTL runs out.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._versions: Dict[str, int] = {}
+        self._entries: Dict[str, Dict[tuple, CacheEntry]] = {}
+        self._adapters: Dict[object, TypeAdapter] = {}
+
+    def version(self, name: str) -> int:
+        return self._versions.get(name, 0)
+
+    def invalidate(self, name: str) -> None:
+        self._versions[name] = self._versions.get(name, 0) + 1
+        self._entries.pop(name, None)
+
+    def get(self, name: str, key: tuple) -> Optional[CacheEntry]:
+        entry = self._entries.get(name, {}).get(key)
+        if entry is None:
+            return None
+        if entry.version != self.version(name) or time.monotonic() - entry.created > self.ttl:
+            del self._entries[name][key]
+            return None
+        return entry
+
+    def put(self, name: str, key: tuple, version: int, schema, rows, headers: Dict[str, str]) -> CacheEntry:
+        # `version` is read before the rows are loaded, so a write that lands
+        # while the query runs leaves this entry already outdated.
+        adapter = self._adapters.get(schema)
+        if adapter is None:
+            adapter = self._adapters[schema] = TypeAdapter(schema)
+        entry = CacheEntry(version, adapter.dump_json(adapter.validate_python(rows, from_attributes=True)), headers)
+        entries = self._entries.setdefault(name, {})
+        if len(entries) >= MAX_ENTRIES_PER_NAME:
+            del entries[next(iter(entries))]
+        entries[key] = entry
+        return entry
+
+
+reference_cache = ReferenceCache(REFERENCE_CACHE_TTL)
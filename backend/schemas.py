@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr
-from typing import Optional
+from typing import Any, Dict, List, Literal, Optional
 from datetime import date, datetime
 
 class ModeratorRead(BaseModel):
@@ -120,6 +120,18 @@ class FilmCreate(BaseModel):
     class Config:
         from_attributes = True
 
+class FilmStockRead(BaseModel):
+    film_id: int
+    copies: int
+    available: int
+    is_available: bool
+
+    class Config:
+        from_attributes = True
+
+class FilmStockUpdate(BaseModel):
+    copies: int = Field(..., ge=0)
+
 class FilmographyRead(BaseModel):
     filmography_id: int
     film_id: int
@@ -235,6 +247,16 @@ class FilmResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class FilmSearchResult(BaseModel):
+    film_id: int
+    film_name: str
+    film_date_release: date
+    film_rental: float
+    rank: float
+
+    class Config:
+        from_attributes = True
+
 class FilmGenreResponse(BaseModel):
     genre_name: str
     film_name: str
@@ -267,5 +289,38 @@ class ModeratorCreate(BaseModel):
     is_admin: bool = False
 
     class Config: 
-        from_attributes = True 
+        from_attributes = True
+
+
+class BulkRowError(BaseModel):
+    row: int  # Номер строки в загруженных данных, начиная с 1
+    errors: List[str]
+
+
+class BulkImportResult(BaseModel):
+    received: int
+    inserted: int
+    errors: List[BulkRowError]
+
+
+class BatchOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    entity: Literal["studios", "genres", "producers", "actors", "clients", "films", "filmographies", "journals"]
+    id: Optional[int] = None  # update/delete
+    data: Dict[str, Any] = {}  # create: every field, update: only the changed ones
+
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(..., min_length=1, max_length=1000)
+
+
+class BatchOperationResult(BaseModel):
+    index: int
+    status: Literal["ok", "error", "skipped"]
+    id: Optional[int] = None
+    errors: List[str] = []
+
 
+class BatchResult(BaseModel):
+    committed: bool
+    results: List[BatchOperationResult]
@@ -0,0 +1,91 @@
+import re
+
+from sqlalchemy import DDL, column, event, func, literal_column, select, table
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.models import Film
+
+# The russian configuration stems Cyrillic words and sends Latin ones to the english stemmer
+SEARCH_CONFIG = "russian"
+
+# Postgres: a stored tsvector (film name weighted above the annotation) with a GIN index
+POSTGRES_DDL = [
+    f"""ALTER TABLE film ADD COLUMN film_search tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(film_name, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', film_annotation), 'B')
+    ) STORED""",
+    "CREATE INDEX ix_film_search ON film USING gin (film_search)",
+]
+
+# SQLite stand-in: an external content FTS5 table kept in sync by triggers
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE film_fts USING fts5(
+        film_name, film_annotation, content='film', content_rowid='film_id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER film_fts_ai AFTER INSERT ON film BEGIN
+        INSERT INTO film_fts(rowid, film_name, film_annotation)
+        VALUES (new.film_id, new.film_name, new.film_annotation);
+    END""",
+    """CREATE TRIGGER film_fts_ad AFTER DELETE ON film BEGIN
+        INSERT INTO film_fts(film_fts, rowid, film_name, film_annotation)
+        VALUES ('delete', old.film_id, old.film_name, old.film_annotation);
+    END""",
+    """CREATE TRIGGER film_fts_au AFTER UPDATE ON film BEGIN
+        INSERT INTO film_fts(film_fts, rowid, film_name, film_annotation)
+        VALUES ('delete', old.film_id, old.film_name, old.film_annotation);
+        INSERT INTO film_fts(rowid, film_name, film_annotation)
+        VALUES (new.film_id, new.film_name, new.film_annotation);
+    END""",
+]
+
+for statement in POSTGRES_DDL:
+    event.listen(Film.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+for statement in SQLITE_DDL:
+    event.listen(Film.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+film_fts = table("film_fts", column("rowid"))
+
+
+def search_terms(q: str) -> list:
+    # Only word characters ever reach the query syntax
+    return re.findall(r"\w+", q.lower())
+
+
+def _postgres_query(terms: list):
+    # The last term is still being typed, so it matches as a prefix
+    tsquery = func.to_tsquery(SEARCH_CONFIG, " & ".join(terms[:-1] + [f"{terms[-1]}:*"]))
+    film_search = literal_column("film.film_search")
+    rank = func.ts_rank_cd(film_search, tsquery)
+    return (
+        select(rank.label("rank"))
+        .where(film_search.op("@@")(tsquery))
+        .order_by(rank.desc(), Film.film_id)
+    )
+
+
+def _sqlite_query(terms: list):
+    # bm25 is lower for better matches; film_name counts ten times the annotation
+    rank = func.bm25(literal_column("film_fts"), 10.0, 1.0)
+    return (
+        select((-rank).label("rank"))
+        .select_from(film_fts)
+        .join(Film, Film.film_id == film_fts.c.rowid)
+        .where(literal_column("film_fts").op("MATCH")(" ".join([f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*'])))
+        .order_by(rank, Film.film_id)
+    )
+
+
+async def search_films(db: AsyncSession, q: str, skip: int, limit: int) -> list:
+    terms = search_terms(q)
+    if not terms:
+        return []
+    connection = await db.connection()
+    build = _postgres_query if connection.dialect.name == "postgresql" else _sqlite_query
+    query = (
+        build(terms)
+        .add_columns(Film.film_id, Film.film_name, Film.film_date_release, Film.film_rental)
+        .offset(skip)
+        .limit(limit)
+    )
+    return (await db.execute(query)).all()
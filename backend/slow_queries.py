@@ -0,0 +1,138 @@
+import logging
+import random
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import event
+
+from config import SLOW_QUERY_EXPLAIN_RATE, SLOW_QUERY_LOG_SIZE, SLOW_QUERY_MS, SLOW_QUERY_REDACT
+from metrics import current_route
+
+logger = logging.getLogger(__name__)
+
+# EXPLAIN ANALYZE runs the statement again, so only plain reads are explained
+_WRITES = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE|TRUNCATE)\b", re.IGNORECASE)
+_MAX_VALUE_LENGTH = 200
+
+
+class SlowQueryLog:
+    """The last ``size`` statements slower than the threshold, newest first."""
+
+    def __init__(self, threshold_ms: Optional[float], explain_rate: float, size: int, redact: tuple):
+        self.threshold_ms = threshold_ms
+        self.explain_rate = explain_rate
+        self.redact = redact
+        self._lock = threading.Lock()
+        self._entries = deque(maxlen=size)
+        self.recorded = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms is not None
+
+    def add(self, entry: dict) -> None:
+        with self._lock:
+            self._entries.appendleft(entry)
+            self.recorded += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "threshold_ms": self.threshold_ms,
+                "explain_rate": self.explain_rate,
+                "recorded": self.recorded,
+                "entries": list(self._entries),
+            }
+
+
+slow_query_log = SlowQueryLog(SLOW_QUERY_MS, SLOW_QUERY_EXPLAIN_RATE, SLOW_QUERY_LOG_SIZE, SLOW_QUERY_REDACT)
+
+
+def _value(value):
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    value = str(value)
+    return value if len(value) <= _MAX_VALUE_LENGTH else value[:_MAX_VALUE_LENGTH] + "..."
+
+
+def redact_parameters(context, parameters, redact: tuple):
+    # The compiled parameters carry the bind names (client_passport_1 etc.), the
+    # DBAPI ones are positional on both drivers
+    if context is not None and getattr(context, "compiled_parameters", None):
+        named = context.compiled_parameters[0]
+    elif isinstance(parameters, dict):
+        named = parameters
+    else:
+        return "[redacted]" if parameters else None
+    return {
+        name: "[redacted]" if any(part in name.lower() for part in redact) else _value(value)
+        for name, value in named.items()
+    }
+
+
+def _explain(conn, statement: str, parameters) -> str:
+    # A cursor of its own: the rows of the slow statement are still to be fetched
+    cursor = conn.connection.cursor()
+    try:
+        if conn.dialect.name == "postgresql":
+            # A failed EXPLAIN must not abort the request's transaction
+            cursor.execute("SAVEPOINT slow_query_explain")
+            try:
+                cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters)
+                plan = "\n".join(row[0] for row in cursor.fetchall())
+            except Exception:
+                cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+                raise
+            cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+            return plan
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        return "\n".join(str(row[-1]) for row in cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+# On the execution context rather than conn.info, so a failed statement takes its start time along
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context.slow_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "slow_query_start", None)
+    if start is None:
+        return
+    duration_ms = (time.perf_counter() - start) * 1000
+    log = slow_query_log
+    if duration_ms < log.threshold_ms:
+        return
+
+    entry = {
+        "at": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+        "duration_ms": round(duration_ms, 3),
+        "route": current_route(),
+        "statement": statement,
+        "parameters": redact_parameters(context, parameters, log.redact),
+        "executemany": executemany,
+        "plan": None,
+    }
+    if not executemany and not _WRITES.search(statement) and random.random() < log.explain_rate:
+        try:
+            entry["plan"] = _explain(conn, statement, parameters)
+        except Exception as error:
+            entry["plan_error"] = f"{type(error).__name__}: {error}"
+    log.add(entry)
+    logger.warning("slow query %.1f ms on %s: %s", duration_ms, entry["route"], statement)
+
+
+def track_slow_queries(engine) -> None:
+    if slow_query_log.enabled:
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
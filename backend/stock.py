@@ -0,0 +1,62 @@
+from typing import Iterable, Optional
+
+from sqlalchemy import exists, func, insert, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import FILM_DEFAULT_COPIES
+from models.models import Film, FilmStock, OpenRental
+
+
+def _on_loan(film_id):
+    # Served by ix_open_rental_film_id
+    return select(func.count()).where(OpenRental.film_id == film_id).scalar_subquery()
+
+
+async def add_film(db: AsyncSession, film_id: int, copies: int = FILM_DEFAULT_COPIES) -> None:
+    await db.execute(insert(FilmStock).values(film_id=film_id, copies=copies, available=copies))
+
+
+async def add_missing(db: AsyncSession, copies: int = FILM_DEFAULT_COPIES) -> None:
+    """Stock rows for films written outside the handlers (bulk import, batch): ``copies``
+    on the shelf besides the ones out on open rentals."""
+    query = select(Film.film_id, _on_loan(Film.film_id) + copies, literal(copies)).where(
+        ~exists().where(FilmStock.film_id == Film.film_id)
+    )
+    await db.execute(insert(FilmStock).from_select(["film_id", "copies", "available"], query))
+
+
+async def recount(db: AsyncSession, film_ids: Optional[Iterable[int]] = None) -> None:
+    """Re-derive ``available`` of the films (all of them by default) from open_rental."""
+    statement = update(FilmStock).values(available=FilmStock.copies - _on_loan(FilmStock.film_id))
+    if film_ids is not None:
+        film_ids = set(film_ids)
+        if not film_ids:
+            return
+        statement = statement.where(FilmStock.film_id.in_(film_ids))
+    await db.execute(statement)
+
+
+async def reserve(db: AsyncSession, film_id: int, copies: int = 1) -> bool:
+    """Take copies of the film for new rentals; False when not enough are on the shelf.
+
+    The conditional UPDATE locks only this film's stock row until the commit: a
+    concurrent checkout of the same film waits for it and then sees the lower
+    count, checkouts of other films do not wait at all.
+    """
+    reserved = await db.scalar(
+        update(FilmStock)
+        .where(FilmStock.film_id == film_id, FilmStock.available >= copies)
+        .values(available=FilmStock.available - copies)
+        .returning(FilmStock.film_id)
+    )
+    return reserved is not None
+
+
+async def set_copies(db: AsyncSession, film_id: int, copies: int) -> Optional[FilmStock]:
+    """None when the film is missing or has more open rentals than ``copies``."""
+    return await db.scalar(
+        update(FilmStock)
+        .where(FilmStock.film_id == film_id, _on_loan(FilmStock.film_id) <= copies)
+        .values(copies=copies, available=copies - _on_loan(FilmStock.film_id))
+        .returning(FilmStock)
+    )
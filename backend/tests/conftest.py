@@ -0,0 +1,89 @@
+"""The app against a throwaway SQLite file (the local stand-in for Postgres).
+
+Tests drive the app in-process; each scenario runs in its own event loop:
+
+    def test_something(api):
+        async def scenario(client):
+            ...
+        api(scenario)
+"""
+import asyncio
+import os
+import tempfile
+import uuid
+
+# Read by config at import time, so set before any app module is imported
+_directory = tempfile.mkdtemp(prefix="videorental-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_directory}/test.db"
+os.environ["SECRET_KEY"] = "test-secret"
+os.environ["STARTUP_WARMUP"] = "false"
+os.environ.pop("SQL_STATEMENT_LIMIT", None)
+
+import httpx
+import pytest
+
+import main
+from database import async_engine, engine
+from models.models import Base
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    Base.metadata.create_all(engine)
+    yield
+    engine.dispose()
+
+
+@pytest.fixture
+def api():
+    def run(scenario):
+        async def wrapper():
+            try:
+                async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+                    return await scenario(client)
+            finally:
+                # aiosqlite connections belong to this loop
+                await async_engine.dispose()
+
+        return asyncio.run(wrapper())
+
+    return run
+
+
+def unique(prefix: str) -> str:
+    return f"{prefix} {uuid.uuid4().hex[:8]}"
+
+
+async def create(client: httpx.AsyncClient, path: str, data: dict) -> dict:
+    response = await client.post(path, json=data)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def create_films(client: httpx.AsyncClient, rentals: list) -> tuple:
+    """A producer of its own with a film per rental price; returns (producer, films)."""
+    studio = await create(client, "/studios/", {"studio_name": unique("studio"), "studio_country": "Россия"})
+    genre = await create(client, "/genres/", {"genre_name": unique("genre")})
+    producer = await create(client, "/producers/", {"producer_name": unique("producer")})
+    films = []
+    for number, rental in enumerate(rentals):
+        films.append(await create(client, "/films/", {
+            "studio_id": studio["studio_id"],
+            "genre_id": genre["genre_id"],
+            "producer_id": producer["producer_id"],
+            "film_name": f"film {number:03}",
+            "film_date_release": "2000-01-01",
+            "film_rental": rental,
+            "film_annotation": "test",
+        }))
+    return producer, films
+
+
+async def create_client(client: httpx.AsyncClient) -> dict:
+    return await create(client, "/clients/", {
+        "client_first_name": "Иван",
+        "client_last_name": "Иванов",
+        "client_address": "ул. Ленина, 1",
+        "client_passport": unique("passport")[-20:],
+        "client_phone_number": "+70000000000",
+    })
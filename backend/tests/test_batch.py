@@ -0,0 +1,37 @@
+from conftest import create_films, unique
+
+
+def test_batch_commits_every_operation(api):
+    async def scenario(client):
+        producer, films = await create_films(client, [1.5, 2.5])
+        name = unique("genre")
+        response = await client.post("/batch", json={"operations": [
+            {"op": "create", "entity": "genres", "data": {"genre_name": name}},
+            {"op": "update", "entity": "films", "id": films[0]["film_id"], "data": {"film_rental": 9.5}},
+        ]})
+        assert response.status_code == 200, response.text
+        assert response.json()["committed"] is True
+        assert [result["status"] for result in response.json()["results"]] == ["ok", "ok"]
+
+        rows = (await client.get(f"/films/?filter=producer_id:eq:{producer['producer_id']}&sort=film_id")).json()
+        assert [row["film_rental"] for row in rows] == [9.5, 2.5]
+
+    api(scenario)
+
+
+def test_batch_rolls_back_on_any_error(api):
+    async def scenario(client):
+        producer, films = await create_films(client, [1.5])
+        response = await client.post("/batch", json={"operations": [
+            {"op": "update", "entity": "films", "id": films[0]["film_id"], "data": {"film_rental": 9.5}},
+            {"op": "update", "entity": "films", "id": 10 ** 9, "data": {"film_rental": 1.0}},
+        ]})
+        assert response.status_code == 422
+        body = response.json()
+        assert body["committed"] is False
+        assert [result["status"] for result in body["results"]] == ["skipped", "error"]
+
+        rows = (await client.get(f"/films/?filter=producer_id:eq:{producer['producer_id']}")).json()
+        assert rows[0]["film_rental"] == 1.5
+
+    api(scenario)
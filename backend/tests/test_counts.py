@@ -0,0 +1,24 @@
+from conftest import create, create_films, unique
+
+
+def test_filtered_count(api):
+    async def scenario(client):
+        producer, _ = await create_films(client, [1.0, 2.0, 3.0, 4.0])
+        response = await client.get(f"/films/?filter=producer_id:eq:{producer['producer_id']}&filter=film_rental:range:2..3&limit=1&count=exact")
+        assert response.headers["X-Total-Count"] == "2"
+        assert response.headers["X-Total-Count-Mode"] == "exact"
+
+    api(scenario)
+
+
+def test_reference_count_follows_writes(api):
+    async def scenario(client):
+        before = int((await client.get("/genres/?count=exact")).headers["X-Total-Count"])
+        genre = await create(client, "/genres/", {"genre_name": unique("genre")})
+        assert (await client.get("/genres/?count=exact")).headers["X-Total-Count"] == str(before + 1)
+        await client.delete(f"/genres/{genre['genre_id']}")
+        assert (await client.get("/genres/?count=exact")).headers["X-Total-Count"] == str(before)
+        # Pages without ?count= are cached apart and carry no count
+        assert "X-Total-Count" not in (await client.get("/genres/")).headers
+
+    api(scenario)
@@ -0,0 +1,40 @@
+from conftest import create_films
+
+RENTALS = [3.0, 1.0, 2.0, 3.0, 1.0, 2.0, 3.0, 1.0, 2.0, 3.0, 5.0]
+
+
+def test_filters(api):
+    async def scenario(client):
+        producer, films = await create_films(client, RENTALS)
+        base = f"/films/?filter=producer_id:eq:{producer['producer_id']}&limit=100"
+        response = await client.get(f"{base}&filter=film_rental:range:2..3")
+        assert sorted(row["film_rental"] for row in response.json()) == sorted(r for r in RENTALS if 2 <= r <= 3)
+        response = await client.get(f"{base}&filter=film_name:prefix:film 00")
+        assert len(response.json()) == 10
+        response = await client.get(f"{base}&filter=film_id:in:{films[0]['film_id']},{films[1]['film_id']}")
+        assert {row["film_id"] for row in response.json()} == {films[0]["film_id"], films[1]["film_id"]}
+
+    api(scenario)
+
+
+def test_sort(api):
+    async def scenario(client):
+        producer, _ = await create_films(client, RENTALS)
+        response = await client.get(f"/films/?filter=producer_id:eq:{producer['producer_id']}&sort=-film_rental&limit=100")
+        assert [row["film_rental"] for row in response.json()] == sorted(RENTALS, reverse=True)
+
+    api(scenario)
+
+
+def test_bad_filters_are_400(api):
+    async def scenario(client):
+        for url in (
+            "/films/?filter=film_rental:eq:cheap",
+            "/films/?filter=unknown:eq:1",
+            "/films/?filter=film_rental:like:1",
+            "/films/?sort=unknown",
+        ):
+            response = await client.get(url)
+            assert response.status_code == 400, url
+
+    api(scenario)
@@ -0,0 +1,23 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+import metrics
+from database import engine
+
+
+def test_failed_statement_leaves_nothing_behind():
+    request = metrics.RequestMetrics({"method": "GET", "path": "/"})
+    token = metrics._current.set(request)
+    try:
+        with engine.connect() as connection:
+            for _ in range(3):
+                with pytest.raises(OperationalError):
+                    connection.execute(text("SELECT * FROM no_such_table"))
+                connection.rollback()
+            connection.execute(text("SELECT 1"))
+            leftovers = {key: value for key, value in connection.info.items() if value}
+    finally:
+        metrics._current.reset(token)
+    assert request.statements == 1
+    assert leftovers == {}
@@ -0,0 +1,47 @@
+from conftest import create_films
+
+RENTALS = [3.0, 1.0, 2.0, 3.0, 1.0, 2.0, 3.0, 1.0, 2.0, 3.0, 5.0]
+
+
+async def walk(client, url: str, limit: int) -> list:
+    rows = []
+    response = await client.get(f"{url}&limit={limit}")
+    while True:
+        assert response.status_code == 200, response.text
+        rows.extend(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return rows
+        response = await client.get(f"{url}&limit={limit}&after={cursor}")
+
+
+def test_cursor_walk_by_id(api):
+    async def scenario(client):
+        producer, films = await create_films(client, RENTALS)
+        rows = await walk(client, f"/films/?filter=producer_id:eq:{producer['producer_id']}", limit=4)
+        assert [row["film_id"] for row in rows] == sorted(film["film_id"] for film in films)
+
+    api(scenario)
+
+
+def test_cursor_walk_with_mixed_sort(api):
+    async def scenario(client):
+        producer, films = await create_films(client, RENTALS)
+        url = f"/films/?filter=producer_id:eq:{producer['producer_id']}&sort=-film_rental,film_name"
+        rows = await walk(client, url, limit=3)
+        expected = sorted(films, key=lambda film: (-film["film_rental"], film["film_name"], film["film_id"]))
+        assert [row["film_id"] for row in rows] == [film["film_id"] for film in expected]
+
+    api(scenario)
+
+
+def test_bad_cursors_are_400(api):
+    async def scenario(client):
+        for cursor in (
+            "WyJ4Il0",  # ["x"] for an integer key
+            "not-a-cursor",
+        ):
+            response = await client.get(f"/films/?after={cursor}")
+            assert response.status_code == 400, cursor
+
+    api(scenario)
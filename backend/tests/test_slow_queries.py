@@ -0,0 +1,27 @@
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+
+import slow_queries
+from slow_queries import SlowQueryLog
+
+
+def test_failed_statement_leaves_nothing_behind(monkeypatch):
+    # Every statement counts as slow, and no plans are taken
+    log = SlowQueryLog(threshold_ms=0, explain_rate=0, size=10, redact=())
+    monkeypatch.setattr(slow_queries, "slow_query_log", log)
+    engine = create_engine("sqlite://")
+    event.listen(engine, "before_cursor_execute", slow_queries._before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", slow_queries._after_cursor_execute)
+
+    with engine.connect() as connection:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                connection.execute(text("SELECT * FROM no_such_table"))
+            connection.rollback()
+        connection.execute(text("SELECT 1"))
+        leftovers = {key: value for key, value in connection.info.items() if value}
+    engine.dispose()
+
+    assert [entry["statement"] for entry in log.snapshot()["entries"]] == ["SELECT 1"]
+    assert leftovers == {}
@@ -0,0 +1,28 @@
+import pytest
+
+from conftest import create_films
+from query_counter import TooManyStatementsError, count_statements
+
+
+def test_films_by_producer_is_one_query(api):
+    async def scenario(client):
+        producer, _ = await create_films(client, [1.5, 2.5, 3.5])
+        url = f"/films/by_producer/{producer['producer_name']}"
+        with count_statements(limit=1) as counter:
+            response = await client.get(url)
+        assert response.status_code == 200
+        assert len(response.json()) == 3
+        assert counter.count == 1
+
+    api(scenario)
+
+
+def test_limit_raises_on_extra_statements(api):
+    async def scenario(client):
+        await create_films(client, [1.5])
+        # ?count=exact adds a COUNT(*) to the page query
+        with count_statements(limit=1):
+            with pytest.raises(TooManyStatementsError):
+                await client.get("/films/?count=exact&filter=film_rental:range:1..2")
+
+    api(scenario)
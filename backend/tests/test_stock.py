@@ -0,0 +1,85 @@
+import asyncio
+
+from conftest import create_client, create_films
+
+ISSUE = {"journal_date_issue": "2024-01-01T00:00:00", "journal_date_return": "2024-01-05T00:00:00"}
+
+
+def rental(film_id: int, client_id: int, refund: bool = False) -> dict:
+    return {"film_id": film_id, "client_id": client_id, "journal_refund": refund, **ISSUE}
+
+
+async def available(client, film_id: int) -> int:
+    return (await client.get(f"/films/{film_id}/stock")).json()["available"]
+
+
+def test_checkout_takes_the_last_copy_once(api):
+    async def scenario(client):
+        _, (film,) = await create_films(client, [1.5])
+        first, second = await create_client(client), await create_client(client)
+        responses = await asyncio.gather(
+            client.post("/journals/", json=rental(film["film_id"], first["client_id"])),
+            client.post("/journals/", json=rental(film["film_id"], second["client_id"])),
+        )
+        assert sorted(response.status_code for response in responses) == [200, 409]
+        assert await available(client, film["film_id"]) == 0
+
+        available_ids = {row["film_id"] for row in (await client.get("/films/available?limit=1000")).json()}
+        assert film["film_id"] not in available_ids
+
+    api(scenario)
+
+
+def test_return_puts_the_copy_back(api):
+    async def scenario(client):
+        _, (film,) = await create_films(client, [1.5])
+        renter, next_renter = await create_client(client), await create_client(client)
+        journal = (await client.post("/journals/", json=rental(film["film_id"], renter["client_id"]))).json()
+
+        response = await client.put(f"/journals/{journal['journal_id']}", json=rental(film["film_id"], renter["client_id"], refund=True))
+        assert response.status_code == 200
+        assert await available(client, film["film_id"]) == 1
+
+        assert (await client.post("/journals/", json=rental(film["film_id"], next_renter["client_id"]))).status_code == 200
+        # Reopening the returned rental would need a second copy
+        response = await client.put(f"/journals/{journal['journal_id']}", json=rental(film["film_id"], renter["client_id"]))
+        assert response.status_code == 409
+
+    api(scenario)
+
+
+def test_batch_cannot_overbook(api):
+    async def scenario(client):
+        _, (film,) = await create_films(client, [1.5])
+        first, second = await create_client(client), await create_client(client)
+        response = await client.post("/batch", json={"operations": [
+            {"op": "create", "entity": "journals", "data": rental(film["film_id"], first["client_id"])},
+            {"op": "create", "entity": "journals", "data": rental(film["film_id"], second["client_id"])},
+        ]})
+        assert response.status_code == 422
+        assert response.json()["committed"] is False
+        assert await available(client, film["film_id"]) == 1
+
+    api(scenario)
+
+
+def test_missing_film_is_404(api):
+    async def scenario(client):
+        renter = await create_client(client)
+        response = await client.post("/journals/", json=rental(10 ** 9, renter["client_id"]))
+        assert response.status_code == 404
+
+    api(scenario)
+
+
+def test_deleted_film_takes_its_stock_along(api):
+    async def scenario(client):
+        _, (film,) = await create_films(client, [1.5])
+        assert (await client.delete(f"/films/{film['film_id']}")).status_code == 200
+        _, (next_film,) = await create_films(client, [1.5])
+        # SQLite reuses the highest rowid once it's deleted
+        assert next_film["film_id"] == film["film_id"]
+        stock = (await client.get(f"/films/{next_film['film_id']}/stock")).json()
+        assert (stock["copies"], stock["available"]) == (1, 1)
+
+    api(scenario)
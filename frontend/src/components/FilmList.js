@@ -21,45 +21,30 @@ const FilmList = () => {
     const [errorMessage, setErrorMessage] = useState('');
 
     useEffect(() => {
-        fetchFilms();
-        fetchStudios();
-        fetchGenres();
-        fetchProducers();
+        fetchPage();
     }, []);
 
-    const fetchFilms = async () => {
+    // Фильмы и справочники для формы одним запросом
+    const fetchPage = async () => {
         try {
-            const response = await axios.get('http://localhost:8000/films_detailed/');
-            setFilms(response.data);
+            const response = await axios.get('http://localhost:8000/bundles/film_list');
+            setFilms(response.data.films);
+            setStudios(response.data.studios);
+            setGenres(response.data.genres);
+            setProducers(response.data.producers);
         } catch (error) {
             console.error('Ошибка при получении фильмов:', error);
         }
     };
 
-    const fetchStudios = async () => {
+    // Сортирует сервер: ?sort=поле или ?sort=-поле по убыванию
+    const fetchFilms = async (config = sortConfig) => {
         try {
-            const response = await axios.get('http://localhost:8000/studios/');
-            setStudios(response.data);
-        } catch (error) {
-            console.error('Ошибка при получении студий:', error);
-        }
-    };
-
-    const fetchGenres = async () => {
-        try {
-            const response = await axios.get('http://localhost:8000/genres/');
-            setGenres(response.data);
-        } catch (error) {
-            console.error('Ошибка при получении жанров:', error);
-        }
-    };
-
-    const fetchProducers = async () => {
-        try {
-            const response = await axios.get('http://localhost:8000/producers/');
-            setProducers(response.data);
+            const sort = (config.direction === 'descending' ? '-' : '') + config.key;
+            const response = await axios.get('http://localhost:8000/films_detailed/', { params: { sort } });
+            setFilms(response.data);
         } catch (error) {
-            console.error('Ошибка при получении режиссеров:', error);
+            console.error('Ошибка при получении фильмов:', error);
         }
     };
 
@@ -154,22 +139,13 @@ const FilmList = () => {
         setErrorMessage(''); // Очищаем сообщение об ошибке при очистке формы
     };
 
-    const sortedFilms = [...films].sort((a, b) => {
-        if (a[sortConfig.key] < b[sortConfig.key]) {
-            return sortConfig.direction === 'ascending' ? -1 : 1;
-        }
-        if (a[sortConfig.key] > b[sortConfig.key]) {
-            return sortConfig.direction === 'ascending' ? 1 : -1;
-        }
-        return 0;
-    });
-
     const requestSort = (key) => {
         let direction = 'ascending';
         if (sortConfig.key === key && sortConfig.direction === 'ascending') {
             direction = 'descending';
         }
         setSortConfig({ key, direction });
+        fetchFilms({ key, direction });
     };
 
     return (
@@ -270,8 +246,8 @@ const FilmList = () => {
                     </tr>
                 </thead>
                 <tbody>
-                    {sortedFilms.length > 0 ? (
-                        sortedFilms.map((film) => (
+                    {films.length > 0 ? (
+                        films.map((film) => (
                             <tr key={film.film_id}>
                                 <td>{film.film_id}</td>
                                 <td>{film.film_name}</td>
@@ -14,35 +14,27 @@ const FilmographyList = () => {
     const [errorMessage, setErrorMessage] = useState('');
 
     useEffect(() => {
-        fetchFilmographies();
-        fetchFilms();
-        fetchActors();
+        fetchPage();
     }, []);
 
-    const fetchFilmographies = async () => {
+    // Filmographies, films and actors in one request
+    const fetchPage = async () => {
         try {
-            const response = await axios.get('http://localhost:8000/filmography_detailed/');
-            setFilmographies(response.data);
+            const response = await axios.get('http://localhost:8000/bundles/filmography_list');
+            setFilmographies(response.data.filmographies);
+            setFilms(response.data.films);
+            setActors(response.data.actors);
         } catch (error) {
             console.error('Error fetching filmographies:', error);
         }
     };
 
-    const fetchFilms = async () => {
-        try {
-            const response = await axios.get('http://localhost:8000/films/');
-            setFilms(response.data);
-        } catch (error) {
-            console.error('Error fetching films:', error);
-        }
-    };
-
-    const fetchActors = async () => {
+    const fetchFilmographies = async () => {
         try {
-            const response = await axios.get('http://localhost:8000/actors/');
-            setActors(response.data);
+            const response = await axios.get('http://localhost:8000/filmography_detailed/');
+            setFilmographies(response.data);
         } catch (error) {
-            console.error('Error fetching actors:', error);
+            console.error('Error fetching filmographies:', error);
         }
     };
 
@@ -35,7 +35,7 @@ const JournalList = () => {
     // Функция для получения списка фильмов
     const fetchFilms = async () => {
         try {
-            const response = await axios.get('http://localhost:8000/films/');
+            const response = await axios.get('http://localhost:8000/films/?fields=film_name');
             setFilms(response.data);
         } catch (error) {
             console.error('Ошибка при получении фильмов:', error);
@@ -45,7 +45,7 @@ const JournalList = () => {
     // Функция для получения списка клиентов
     const fetchClients = async () => {
         try {
-            const response = await axios.get('http://localhost:8000/clients/');
+            const response = await axios.get('http://localhost:8000/clients/?fields=client_first_name,client_last_name');
             setClients(response.data);
         } catch (error) {
             console.error('Ошибка при получении клиентов:', error);